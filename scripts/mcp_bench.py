@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Microbenchmarks for the MCP transport in `scripts/mcp_client.py`.
+
+Everything runs offline: payloads come from `scripts/mcp_stub.py`, which
+also stands in for the server in `client`.
+
+`codec` measures how fast each installed JSON codec (see
+`mcp_client.available_codecs`) decodes and encodes a `tools/call` response
+the size of a real semgrep scan. Decoding is timed twice: plain `loads`,
+and `JSONCodec.decode` as the transport calls it (GC paused for large
+lines). The payload is synthesized with semgrep's result shape (check_id,
+path, start/end, extra.message/metadata/lines, fingerprint), or read from a
+file holding one recorded response line.
+
+`client` drives a SemgrepMCPClient (or AsyncMCPClient) against the stub and
+reports throughput and latency percentiles for a given number of calls in
+flight, server latency and result size. With `--timeout` below the stub's
+latency it measures how promptly calls fail and are cancelled instead;
+with `--crash-after` it measures respawn downtime and retries.
+
+Usage:
+
+    python3 scripts/mcp_bench.py codec                      # 20k findings
+    python3 scripts/mcp_bench.py codec --findings 100000 --repeat 3
+    python3 scripts/mcp_bench.py codec --payload response.json --format json
+    python3 scripts/mcp_bench.py client --calls 500 --concurrency 16 --latency 0.02
+    python3 scripts/mcp_bench.py client --client async --findings 2000
+    python3 scripts/mcp_bench.py client --latency 0.5 --timeout 0.1
+    python3 scripts/mcp_bench.py client --recording session.jsonl
+    python3 scripts/mcp_bench.py client --crash-after 50 --backoff 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+from mcp_client import AsyncMCPClient, SemgrepMCPClient, SemgrepMCPError, available_codecs
+from mcp_stub import scan_response
+
+
+STUB = Path(__file__).resolve().parent / "mcp_stub.py"
+
+
+def best_time(fn, repeat: int) -> tuple[float, float]:
+    """(best, median) wall time of `fn()` over `repeat` runs."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times), statistics.median(times)
+
+
+def cmd_codec(args: argparse.Namespace) -> int:
+    if args.payload:
+        line = Path(args.payload).read_bytes().strip()
+        label = args.payload
+    else:
+        line = json.dumps(scan_response(args.findings)).encode()
+        label = f"synthetic, {args.findings} findings"
+    message = json.loads(line)
+    size_mb = len(line) / 1e6
+
+    rows = []
+    for name, codec in available_codecs().items():
+        if args.codec and name not in args.codec:
+            continue
+        if codec.loads(codec.dumps(message)) != message:
+            print(f"{name}: round trip changed the payload; skipping", file=sys.stderr)
+            continue
+        loads, _ = best_time(lambda: codec.loads(line), args.repeat)
+        decode, decode_median = best_time(lambda: codec.decode(line), args.repeat)
+        encode, _ = best_time(lambda: codec.dumps(message), args.repeat)
+        rows.append({
+            "codec": name,
+            "loads_ms": round(loads * 1000, 1),
+            "decode_ms": round(decode * 1000, 1),
+            "decode_median_ms": round(decode_median * 1000, 1),
+            "decode_mb_s": round(size_mb / decode, 1),
+            "encode_ms": round(encode * 1000, 1),
+            "encode_mb_s": round(size_mb / encode, 1),
+        })
+    # Speedup is against what the transport did before codecs were
+    # pluggable: stdlib json.loads with the GC running.
+    baseline = next((row for row in rows if row["codec"] == "json"), None)
+    for row in rows:
+        row["decode_speedup"] = round(baseline["loads_ms"] / row["decode_ms"], 2) if baseline and row["decode_ms"] else None
+
+    if args.format == "json":
+        print(json.dumps({"payload": label, "bytes": len(line), "repeat": args.repeat, "codecs": rows}, indent=2))
+        return 0
+    print(f"Payload: {label}, {size_mb:.1f} MB, best of {args.repeat}")
+    print(f"{'codec':<10} {'loads ms':>9} {'decode ms':>10} {'MB/s':>8} {'vs json':>8} {'encode ms':>10} {'MB/s':>8}")
+    for row in rows:
+        speedup = f"{row['decode_speedup']}x" if row["decode_speedup"] else "-"
+        print(
+            f"{row['codec']:<10} {row['loads_ms']:>9} {row['decode_ms']:>10} {row['decode_mb_s']:>8} {speedup:>8} "
+            f"{row['encode_ms']:>10} {row['encode_mb_s']:>8}"
+        )
+    return 0
+
+
+def stub_latency(args: argparse.Namespace) -> float:
+    # Without --latency a replay keeps the recorded timing (0 tells the stub
+    # not to override it); a synthetic run defaults to 10 ms.
+    if args.latency is not None:
+        return args.latency
+    return 0.0 if args.recording else 0.01
+
+
+def stub_command(args: argparse.Namespace) -> list[str]:
+    latency = stub_latency(args)
+    command = [sys.executable, str(STUB), "serve", "--latency", str(latency), "--jitter", str(args.jitter),
+               "--findings", str(args.findings), "--progress-steps", str(args.progress_steps)]
+    if args.recording:
+        command += ["--recording", args.recording]
+    if args.crash_after:
+        command += ["--crash-after", str(args.crash_after)]
+    return command
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_threaded(args: argparse.Namespace, arguments: dict) -> tuple[float, list[tuple[str, float]], dict | None]:
+    """Keep `concurrency` calls in flight on one client until `calls` are
+    done. Returns (handshake seconds, [(outcome, latency), ...], the
+    client's self-healing metrics)."""
+    started = time.perf_counter()
+    client = SemgrepMCPClient.spawn(
+        stub_command(args), use_broker=False, codec=args.codec, respawn=bool(args.crash_after), backoff=args.backoff
+    )
+    handshake = time.perf_counter() - started
+    outcomes: list[tuple[str, float]] = []
+    window = threading.Semaphore(args.concurrency)
+    lock = threading.Lock()
+    done = threading.Event()
+    progress = (lambda *_: None) if args.progress_steps else None
+
+    def finished(future, sent: float) -> None:
+        elapsed = time.perf_counter() - sent
+        try:
+            future.result()
+            outcome = "ok"
+        except SemgrepMCPError as exc:
+            outcome = "timeout" if "timed out" in str(exc) else "error"
+        with lock:
+            outcomes.append((outcome, elapsed))
+            if len(outcomes) == args.calls:
+                done.set()
+        window.release()
+
+    try:
+        for _ in range(args.calls):
+            window.acquire()
+            sent = time.perf_counter()
+            future = client.call_async("semgrep_scan", arguments, args.timeout, progress)
+            future.add_done_callback(lambda future, sent=sent: finished(future, sent))
+        done.wait()
+    finally:
+        client.close()
+    return handshake, outcomes, client.metrics
+
+
+def run_async(args: argparse.Namespace, arguments: dict) -> tuple[float, list[tuple[str, float]], dict | None]:
+    async def bench() -> tuple[float, list[tuple[str, float]], dict | None]:
+        started = time.perf_counter()
+        client = await AsyncMCPClient.spawn(stub_command(args), codec=args.codec)
+        handshake = time.perf_counter() - started
+        window = asyncio.Semaphore(args.concurrency)
+        progress = (lambda *_: None) if args.progress_steps else None
+
+        async def one() -> tuple[str, float]:
+            async with window:
+                sent = time.perf_counter()
+                try:
+                    await client.call("semgrep_scan", arguments, args.timeout, progress)
+                    outcome = "ok"
+                except SemgrepMCPError as exc:
+                    outcome = "timeout" if "timed out" in str(exc) else "error"
+                return outcome, time.perf_counter() - sent
+
+        try:
+            outcomes = await asyncio.gather(*(one() for _ in range(args.calls)))
+        finally:
+            await client.close()
+        return handshake, list(outcomes), None
+
+    return asyncio.run(bench())
+
+
+def cmd_client(args: argparse.Namespace) -> int:
+    arguments = {"path": "src/", "config": "auto"}
+    started = time.perf_counter()
+    runner = run_async if args.client == "async" else run_threaded
+    if args.crash_after and args.client == "async":
+        raise SystemExit("--crash-after needs the threaded client (AsyncMCPClient doesn't respawn)")
+    handshake, outcomes, healing = runner(args, arguments)
+    wall = time.perf_counter() - started - handshake
+    latencies = {kind: [elapsed for outcome, elapsed in outcomes if outcome == kind] for kind in ("ok", "error", "timeout")}
+    ok = latencies["ok"]
+
+    def ms(value: float | None) -> float | None:
+        return round(value * 1000, 2) if value is not None else None
+
+    report = {
+        "client": args.client,
+        "codec": args.codec or next(iter(available_codecs())),
+        "calls": args.calls,
+        "concurrency": args.concurrency,
+        "server_latency_s": "recorded" if args.recording and args.latency is None else stub_latency(args),
+        "findings_per_call": None if args.recording else args.findings,
+        "handshake_ms": ms(handshake),
+        "wall_s": round(wall, 3),
+        "calls_per_s": round(len(outcomes) / wall, 1) if wall else None,
+        "ok": len(ok),
+        "errors": len(latencies["error"]),
+        "timeouts": len(latencies["timeout"]),
+        "latency_ms": {"p50": ms(percentile(ok, 0.5)), "p95": ms(percentile(ok, 0.95)), "p99": ms(percentile(ok, 0.99)), "max": ms(max(ok, default=None))},
+        "timeout_fail_ms": {"p50": ms(percentile(latencies["timeout"], 0.5)), "max": ms(max(latencies["timeout"], default=None))},
+        "healing": healing if args.crash_after else None,
+    }
+    if args.format == "json":
+        print(json.dumps(report, indent=2))
+        return 0
+    print(
+        f"{report['client']} client, {report['codec']} codec: {args.calls} calls, {args.concurrency} in flight, "
+        f"server latency {report['server_latency_s']}{'' if isinstance(report['server_latency_s'], str) else 's'}, "
+        f"handshake {report['handshake_ms']} ms"
+    )
+    print(f"  {report['calls_per_s']} calls/s over {report['wall_s']}s; ok {report['ok']}, errors {report['errors']}, timeouts {report['timeouts']}")
+    if ok:
+        latency = report["latency_ms"]
+        print(f"  latency ms: p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}, max {latency['max']}")
+    if report["healing"]:
+        healing = report["healing"]
+        print(
+            f"  respawns {healing['respawns']} ({healing['respawn_failures']} failed), downtime {healing['downtime_s']}s, "
+            f"retried {healing['retried_calls']}, abandoned {healing['abandoned_calls']}"
+        )
+    if latencies["timeout"]:
+        print(f"  timed-out calls failed after: p50 {report['timeout_fail_ms']['p50']} ms, max {report['timeout_fail_ms']['max']} ms (timeout {args.timeout}s)")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    codec = subparsers.add_parser("codec", help="Decode/encode throughput of each JSON codec on a scan-sized response.")
+    codec.add_argument("--findings", type=int, default=20000, help="Findings in the synthetic response. Default: 20000 (~20 MB).")
+    codec.add_argument("--payload", help="Benchmark this file (one JSON-RPC response) instead of a synthetic one.")
+    codec.add_argument("--repeat", type=int, default=5, help="Runs per codec; the best is reported. Default: 5.")
+    codec.add_argument("--codec", action="append", help="Only this codec (repeatable). Default: every installed one.")
+    codec.add_argument("--format", choices=["text", "json"], default="text")
+    codec.set_defaults(func=cmd_codec)
+
+    client = subparsers.add_parser("client", help="Throughput and latency of an MCP client against the stub server.")
+    client.add_argument("--client", choices=["threaded", "async"], default="threaded", help="SemgrepMCPClient or AsyncMCPClient. Default: threaded.")
+    client.add_argument("--calls", type=int, default=200, help="semgrep_scan calls to make. Default: 200.")
+    client.add_argument("--concurrency", type=int, default=8, help="Calls kept in flight. Default: 8.")
+    client.add_argument("--latency", type=float, help="Stub latency per call, in seconds. Default: 0.01, or the recorded timing with --recording.")
+    client.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on --latency. Default: 0.")
+    client.add_argument("--findings", type=int, default=100, help="Findings per result. Default: 100.")
+    client.add_argument("--progress-steps", type=int, default=0, help="Ask for progress and have the stub send this many per call. Default: 0.")
+    client.add_argument("--timeout", type=float, help="Per-call client timeout. Default: the client's (300s).")
+    client.add_argument("--recording", help="Have the stub replay this `mcp_stub.py record` log.")
+    client.add_argument("--crash-after", type=int, default=0, help="Crash each stub process after this many calls; the client respawns it. Default: never.")
+    client.add_argument("--backoff", type=float, default=0.5, help="Initial respawn backoff with --crash-after, in seconds. Default: 0.5.")
+    client.add_argument("--codec", choices=sorted(available_codecs()), help="JSON codec. Default: fastest installed.")
+    client.add_argument("--format", choices=["text", "json"], default="text")
+    client.set_defaults(func=cmd_client)
+    return parser
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
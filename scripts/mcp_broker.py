@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""Long-lived broker that keeps Semgrep MCP servers warm across scans.
+
+Every `SemgrepMCPClient.spawn()` otherwise starts a fresh server (`uvx`
+resolution, interpreter start, rule loading, handshake) and kills it on
+`close()`. For `security_audit.py watch` and repeated CI steps on one
+runner, that start-up dominates. The broker listens on a per-user unix
+socket, keeps up to `--max-servers` servers per command, and multiplexes
+client connections onto them. Clients opt in: `SemgrepMCPClient.spawn()`
+attaches with `use_broker=True` or `SEMGREP_MCP_USE_BROKER=1`, and only to
+a socket owned by the same user in a directory nobody else can write.
+
+Wire format on the socket: one JSON hello line, then plain MCP JSON-RPC.
+
+    --> {"broker": "attach", "command": ["uvx", "semgrep-mcp"] | null}
+    <-- {"broker": "ok", "pid": 1234}
+    --> {"jsonrpc": "2.0", "id": 1, "method": "initialize", ...}   (answered
+        from the warm server's cached handshake)
+    --> {"jsonrpc": "2.0", "id": 2, "method": "tools/call", ...}    (forwarded
+        under a broker-assigned id; the response is mapped back, and
+        progress notifications under the client's own progressToken)
+
+Usage:
+
+    python3 scripts/mcp_broker.py serve &      # or under systemd --user
+    python3 scripts/mcp_broker.py status
+    python3 scripts/mcp_broker.py stop
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+from mcp_client import (
+    SemgrepMCPClient,
+    SemgrepMCPError,
+    broker_socket_path,
+    broker_socket_problem,
+    default_command,
+    get_codec,
+)
+
+
+@dataclass
+class WarmServer:
+    command: tuple[str, ...]
+    client: SemgrepMCPClient
+    attached: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def load(self) -> int:
+        return self.attached + self.client.in_flight
+
+
+class Broker:
+    """Pool of warm MCP servers keyed by command.
+
+    `acquire` hands out the least-loaded live server, starting another while
+    every existing one is busy and the pool is below `max_servers`. A start
+    reserves its slot under the lock but runs outside it, so other clients
+    (and `status`) aren't held up behind a slow `uvx` resolution. A
+    maintenance thread closes servers idle longer than `idle_timeout` and
+    pings idle ones every `health_interval`, replacing any that don't answer.
+    Servers are spawned with `respawn=True`, so a crash mid-call is healed
+    under the attached clients instead of failing their requests.
+    """
+
+    def __init__(self, max_servers: int, idle_timeout: float, health_interval: float, request_timeout: float) -> None:
+        self.max_servers = max_servers
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.request_timeout = request_timeout
+        self.pools: dict[tuple[str, ...], list[WarmServer]] = {}
+        self.starting: dict[tuple[str, ...], int] = {}  # reserved slots whose server is still spawning
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.started = time.monotonic()
+        self.stopping = threading.Event()
+
+    def acquire(self, command: list[str] | None) -> WarmServer:
+        key = tuple(command or default_command())
+        with self.changed:
+            while True:
+                pool = self.pools.setdefault(key, [])
+                pool[:] = [server for server in pool if server.client.alive]
+                best = min(pool, key=lambda server: server.load, default=None)
+                starting = self.starting.get(key, 0)
+                room = len(pool) + starting < max(self.max_servers, 1)
+                if best is not None and (best.load == 0 or not room):
+                    best.attached += 1
+                    best.last_used = time.monotonic()
+                    return best
+                if room:
+                    self.starting[key] = starting + 1
+                    break
+                # Every slot is a server that is still starting; wait for one.
+                self.changed.wait()
+        try:
+            client = SemgrepMCPClient.spawn(list(key), use_broker=False, timeout=self.request_timeout, respawn=True)
+        except BaseException:
+            with self.changed:
+                self.starting[key] -= 1
+                self.changed.notify_all()
+            raise
+        server = WarmServer(key, client, attached=1)
+        with self.changed:
+            self.starting[key] -= 1
+            if not self.stopping.is_set():
+                self.pools.setdefault(key, []).append(server)
+            self.changed.notify_all()
+        if self.stopping.is_set():
+            client.close()
+            raise SemgrepMCPError("broker is shutting down")
+        return server
+
+    def release(self, server: WarmServer) -> None:
+        with self.lock:
+            server.attached -= 1
+            server.last_used = time.monotonic()
+
+    def _retire(self, server: WarmServer) -> None:
+        with self.changed:
+            pool = self.pools.get(server.command, [])
+            if server in pool:
+                pool.remove(server)
+            self.changed.notify_all()
+        server.client.close()
+
+    def maintain(self) -> None:
+        while not self.stopping.wait(self.health_interval):
+            with self.lock:
+                servers = [server for pool in self.pools.values() for server in pool]
+            now = time.monotonic()
+            for server in servers:
+                if not server.client.alive:
+                    self._retire(server)
+                elif server.load == 0 and now - server.last_used > self.idle_timeout:
+                    self._retire(server)
+                elif server.load == 0:
+                    try:
+                        server.client.ping(timeout=10)
+                    except SemgrepMCPError:
+                        self._retire(server)
+
+    def status(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self.lock:
+            servers = [
+                {
+                    "command": list(server.command),
+                    "pid": server.client.proc.pid,
+                    "attached": server.attached,
+                    "in_flight": server.client.in_flight,
+                    "idle_s": round(now - server.last_used, 1) if server.load == 0 else 0,
+                    **server.client.metrics,
+                }
+                for pool in self.pools.values()
+                for server in pool
+            ]
+        return {"broker": "status", "uptime_s": round(now - self.started, 1), "servers": servers}
+
+    def close(self) -> None:
+        self.stopping.set()
+        with self.lock:
+            servers = [server for pool in self.pools.values() for server in pool]
+            self.pools.clear()
+        for server in servers:
+            server.client.close()
+
+
+class BrokerHandler(socketserver.StreamRequestHandler):
+    """One client connection: relay its JSON-RPC to a warm server, mapping
+    request ids both ways so many connections can share one server."""
+
+    server: "BrokerServer"
+
+    def send(self, message: dict[str, Any]) -> None:
+        data = self.codec.dumps(message) + b"\n"
+        with self.write_lock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except (OSError, ValueError):
+                pass  # client went away (ValueError: handler already closed wfile); its in-flight replies are moot
+
+    def handle(self) -> None:
+        self.write_lock = threading.Lock()
+        self.codec = get_codec()
+        try:
+            hello = json.loads(self.rfile.readline() or b"{}")
+        except json.JSONDecodeError:
+            return
+        broker = self.server.broker
+        if hello.get("broker") == "status":
+            self.send(broker.status())
+            return
+        if hello.get("broker") == "stop":
+            self.send({"broker": "stopping"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        try:
+            warm = broker.acquire(hello.get("command"))
+        except SemgrepMCPError as exc:
+            self.send({"broker": "error", "message": str(exc)})
+            return
+        self.send({"broker": "ok", "pid": warm.client.proc.pid})
+        upstream_ids: dict[Any, int] = {}
+        try:
+            for line in self.rfile:
+                try:
+                    message = self.codec.loads(line)
+                except self.codec.errors:
+                    break
+                self.relay(warm, message, upstream_ids)
+        finally:
+            # Drop whatever this client still had running on the server.
+            for upstream_id in upstream_ids.values():
+                warm.client.cancel(upstream_id, "client disconnected")
+            broker.release(warm)
+
+    def relay(self, warm: WarmServer, message: dict[str, Any], upstream_ids: dict[Any, int]) -> None:
+        method = message.get("method")
+        params = message.get("params") or {}
+        if "id" in message and method == "initialize":
+            self.send({"jsonrpc": "2.0", "id": message["id"], "result": warm.client.server_info})
+        elif "id" in message and method:
+            client_id = message["id"]
+            # The client's progress token only means something on this
+            # connection; upstream the warm client issues its own and the
+            # notifications are routed back here under the original token.
+            meta = dict(params.get("_meta") or {})
+            token = meta.pop("progressToken", None)
+            progress = None
+            if token is not None:
+                params = {**params, "_meta": meta}
+
+                def progress(done: float, total: float | None, text: str | None, token: Any = token) -> None:
+                    update = {"progressToken": token, "progress": done, "total": total, "message": text}
+                    self.send({
+                        "jsonrpc": "2.0",
+                        "method": "notifications/progress",
+                        "params": {key: value for key, value in update.items() if value is not None},
+                    })
+
+            try:
+                upstream_id, future = warm.client.send_request(method, params, progress=progress)
+            except SemgrepMCPError as exc:
+                self.send({"jsonrpc": "2.0", "id": client_id, "error": {"code": -32603, "message": str(exc)}})
+                return
+            upstream_ids[client_id] = upstream_id
+
+            def reply(done: Future, client_id: Any = client_id) -> None:
+                upstream_ids.pop(client_id, None)
+                try:
+                    self.send({"jsonrpc": "2.0", "id": client_id, "result": done.result()})
+                except SemgrepMCPError as exc:
+                    self.send({"jsonrpc": "2.0", "id": client_id, "error": {"code": -32603, "message": str(exc)}})
+
+            future.add_done_callback(reply)
+        elif method == "notifications/initialized":
+            pass  # the warm server finished its handshake long ago
+        elif method == "notifications/cancelled":
+            upstream_id = upstream_ids.pop(params.get("requestId"), None)
+            if upstream_id is not None:
+                warm.client.cancel(upstream_id, params.get("reason") or "cancelled by client")
+        elif method:
+            try:
+                warm.client.notify(method, params)
+            except SemgrepMCPError:
+                pass
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, broker: Broker) -> None:
+        self.broker = broker
+        super().__init__(path, BrokerHandler)
+
+
+def broker_request(message: dict[str, Any]) -> dict[str, Any] | None:
+    """Send a control message (`status`, `stop`) to a running broker."""
+    path = broker_socket_path()
+    if broker_socket_problem(path) is not None:
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(path)
+            sock.sendall((json.dumps(message) + "\n").encode())
+            return json.loads(sock.makefile("rb").readline())
+    except (OSError, ValueError):
+        return None
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    path = broker_socket_path()
+    # The default socket lives in a private per-user directory; create it
+    # 0700 and refuse a directory someone else owns or can write to.
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, mode=0o700, exist_ok=True)
+    if os.path.lexists(path):
+        if broker_request({"broker": "status"}) is not None:
+            print(f"Broker already running on {path}", file=sys.stderr)
+            return 1
+        if os.lstat(path).st_uid != os.getuid():
+            print(f"Refusing to replace {path}: owned by another user", file=sys.stderr)
+            return 1
+        os.unlink(path)  # stale socket from a crashed broker
+    broker = Broker(args.max_servers, args.idle_timeout, args.health_interval, args.request_timeout)
+    old_umask = os.umask(0o177)  # socket is for this user only
+    try:
+        server = BrokerServer(path, broker)
+    finally:
+        os.umask(old_umask)
+    problem = broker_socket_problem(path)
+    if problem is not None:
+        server.server_close()
+        os.unlink(path)
+        print(f"Clients would not trust {path}: {problem}", file=sys.stderr)
+        return 1
+    threading.Thread(target=broker.maintain, name="broker-maintain", daemon=True).start()
+    print(f"Semgrep MCP broker listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        broker.close()
+        if os.path.exists(path):
+            os.unlink(path)
+    return 0
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    status = broker_request({"broker": "status"})
+    if status is None:
+        print(f"No broker on {broker_socket_path()}", file=sys.stderr)
+        return 1
+    print(json.dumps(status, indent=2))
+    return 0
+
+
+def cmd_stop(args: argparse.Namespace) -> int:
+    if broker_request({"broker": "stop"}) is None:
+        print(f"No broker on {broker_socket_path()}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Run the broker in the foreground.")
+    serve.add_argument("--max-servers", type=int, default=os.cpu_count() or 1, help="Warm servers per command. Default: CPU count.")
+    serve.add_argument("--idle-timeout", type=float, default=600.0, help="Close a server unused for this many seconds. Default: 600.")
+    serve.add_argument("--health-interval", type=float, default=30.0, help="Seconds between health pings of idle servers. Default: 30.")
+    serve.add_argument("--request-timeout", type=float, default=3600.0, help="Upper bound on any forwarded request. Default: 3600.")
+    serve.set_defaults(func=cmd_serve)
+
+    status = subparsers.add_parser("status", help="Show the broker's warm servers.")
+    status.set_defaults(func=cmd_status)
+
+    stop = subparsers.add_parser("stop", help="Shut the broker and its servers down.")
+    stop.set_defaults(func=cmd_stop)
+    return parser
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
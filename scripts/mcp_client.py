@@ -18,21 +18,485 @@ Usage:
             ...
     finally:
         client.close()
+
+Calls can be pipelined: `call_async` returns a `concurrent.futures.Future`,
+so several scans can be in flight on one server at once:
+
+    futures = [client.call_async("semgrep_scan", {"path": p}) for p in shards]
+    results = [f.result() for f in futures]
+
+A long call can report progress: pass `progress=` a callable and it is
+invoked with `(progress, total, message)` for every `notifications/progress`
+the server sends for that call:
+
+    client.call("semgrep_scan", args, progress=lambda done, total, msg: ...)
+
+The server's `tools/list` is cached on disk per server build, so a server
+that lacks the tools a caller needs is recognised without starting it:
+
+    needs = {"semgrep_scan": ["path", "config"]}
+    if is_available(required=needs):
+        client = SemgrepMCPClient.spawn()
+        client.require(needs)  # SemgrepMCPError if a tool or argument is missing
 """
 
 from __future__ import annotations
 
+import asyncio
+import gc
 import json
+import os
+import selectors
 import shutil
+import socket
+import stat
 import subprocess
 import sys
-from typing import Any
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # optional: faster (de)serialization of large results
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional: same, used when orjson is missing
+    msgspec = None
+
+
+# Called with (progress, total, message) for each progress notification.
+ProgressCallback = Callable[[float, "float | None", "str | None"], None]
 
 
 class SemgrepMCPError(RuntimeError):
     """Raised when the MCP server returns an error or the transport fails."""
 
 
+DEFAULT_TIMEOUT = 300.0  # seconds per tool call; a full-repo scan is slow
+HANDSHAKE_TIMEOUT = 30.0
+STDERR_TAIL_KB = 64
+READ_CHUNK = 1 << 20  # stdout read size; scan results run to tens of MB
+TOOLS_CACHE_TTL = 7 * 86400  # `uvx` can resolve a newer server behind the same binary
+GC_PAUSE_BYTES = 1 << 20  # decode larger messages with the cyclic GC paused
+
+
+INITIALIZE_PARAMS = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {},
+    "clientInfo": {"name": "security-audit-skill", "version": "0.1.0"},
+}
+
+
+@dataclass(frozen=True)
+class JSONCodec:
+    """How messages are (de)serialized on the wire. `dumps` returns bytes
+    without the trailing newline; `errors` are what `loads` raises on bad
+    input."""
+
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+    errors: tuple[type[Exception], ...]
+
+    def decode(self, line: bytes) -> Any:
+        """`loads`, with the cyclic GC paused for large messages: decoding a
+        scan result allocates millions of containers, and the collections
+        that triggers roughly double the decode time while finding nothing
+        to free. Only re-enables the GC if it was on."""
+        if len(line) < GC_PAUSE_BYTES or not gc.isenabled():
+            return self.loads(line)
+        gc.disable()
+        try:
+            return self.loads(line)
+        finally:
+            gc.enable()
+
+
+def _stdlib_codec() -> JSONCodec:
+    return JSONCodec("json", lambda obj: json.dumps(obj).encode(), json.loads, (ValueError,))
+
+
+def available_codecs() -> dict[str, JSONCodec]:
+    """Every codec importable here, fastest first."""
+    codecs = {}
+    if orjson is not None:
+        codecs["orjson"] = JSONCodec("orjson", orjson.dumps, orjson.loads, (orjson.JSONDecodeError,))
+    if msgspec is not None:
+        codecs["msgspec"] = JSONCodec("msgspec", msgspec.json.encode, msgspec.json.decode, (msgspec.DecodeError,))
+    codecs["json"] = _stdlib_codec()
+    return codecs
+
+
+def get_codec(name: str | None = None) -> JSONCodec:
+    """The codec called `name`, else `$SEMGREP_MCP_JSON`, else the fastest
+    installed one (orjson, msgspec, then the stdlib `json`)."""
+    codecs = available_codecs()
+    name = name or os.environ.get("SEMGREP_MCP_JSON")
+    if not name:
+        return next(iter(codecs.values()))
+    if name not in codecs:
+        raise SemgrepMCPError(f"JSON codec {name!r} is not available (have: {', '.join(codecs)})")
+    return codecs[name]
+
+
+def default_command() -> list[str]:
+    """The server invocation to use when none is given: `uvx semgrep-mcp`,
+    else an installed `semgrep-mcp` binary."""
+    if shutil.which("uvx"):
+        return ["uvx", "semgrep-mcp"]
+    if shutil.which("semgrep-mcp"):
+        return ["semgrep-mcp"]
+    raise SemgrepMCPError(
+        "Cannot find uvx or semgrep-mcp. Install one of:\n"
+        "  pipx install uv  (then `uvx semgrep-mcp` will work)\n"
+        "  pipx install semgrep-mcp"
+    )
+
+
+def broker_enabled() -> bool:
+    """Whether clients may attach to a broker when the caller doesn't say:
+    only when `$SEMGREP_MCP_USE_BROKER` is set to a true value."""
+    return os.environ.get("SEMGREP_MCP_USE_BROKER", "").lower() in {"1", "true", "yes", "on"}
+
+
+def broker_socket_path() -> str:
+    """Where `scripts/mcp_broker.py` listens: `$SEMGREP_MCP_BROKER`, else a
+    per-user socket in `$XDG_RUNTIME_DIR`, else in a private
+    `semgrep-mcp-<uid>` directory under the temp dir."""
+    if os.environ.get("SEMGREP_MCP_BROKER"):
+        return os.environ["SEMGREP_MCP_BROKER"]
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], f"semgrep-mcp-broker-{user}.sock")
+    runtime = os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(runtime, f"semgrep-mcp-{user}", "broker.sock")
+
+
+def broker_socket_problem(path: str) -> str | None:
+    """Why the socket at `path` can't be trusted to be this user's broker,
+    or None if it can. The socket must be owned by the current user, and
+    its directory must be owned by the user (or root) and writable by
+    nobody else, so another local user can't plant or swap it and answer
+    scans with forged results."""
+    if not hasattr(os, "getuid"):
+        return "broker sockets are only supported on POSIX"
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return "no broker socket"
+    if not stat.S_ISSOCK(st.st_mode):
+        return f"{path} is not a socket"
+    if st.st_uid != os.getuid():
+        return f"{path} is owned by uid {st.st_uid}, not {os.getuid()}"
+    parent = os.path.dirname(os.path.abspath(path))
+    try:
+        dir_st = os.lstat(parent)
+    except OSError as exc:
+        return f"cannot stat {parent}: {exc}"
+    if not stat.S_ISDIR(dir_st.st_mode):
+        return f"{parent} is not a directory"
+    if dir_st.st_uid not in (os.getuid(), 0):
+        return f"{parent} is owned by uid {dir_st.st_uid}"
+    if dir_st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return f"{parent} is writable by other users"
+    return None
+
+
+def connect_broker(command: list[str] | None = None, timeout: float = 5.0) -> socket.socket | None:
+    """Attach to a running broker for `command` (None: the broker's default
+    server). Returns the connected socket, or None if no trusted broker
+    answers (see `broker_socket_problem`)."""
+    path = broker_socket_path()
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    problem = broker_socket_problem(path)
+    if problem is not None:
+        print(f"Not attaching to MCP broker: {problem}", file=sys.stderr)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall((json.dumps({"broker": "attach", "command": command}) + "\n").encode())
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise OSError("broker closed the connection")
+            reply += chunk
+        if json.loads(reply).get("broker") != "ok":
+            raise OSError(f"broker refused: {reply.decode(errors='replace').strip()}")
+        sock.settimeout(None)
+        return sock
+    except (OSError, ValueError):
+        sock.close()
+        return None
+
+
+class _SocketWriter:
+    """File-like writer for a broker socket that blocks until everything is
+    sent. The reader thread puts the socket's fd in non-blocking mode, and
+    O_NONBLOCK lives on the open file description, so it reaches the
+    writer too (a `dup()`ed fd shares it); a plain `makefile("wb")` would
+    then raise BlockingIOError once a large request fills the send buffer."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+
+    def write(self, data: bytes) -> int:
+        view = memoryview(data)
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.sock, selectors.EVENT_WRITE)
+            while view:
+                try:
+                    sent = self.sock.send(view)
+                except (BlockingIOError, InterruptedError):
+                    selector.select()
+                    continue
+                view = view[sent:]
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass  # the socket is closed by _BrokerProcess.terminate
+
+
+class _BrokerProcess:
+    """Popen-shaped wrapper over a broker connection, so SemgrepMCPClient
+    can speak to a warm, shared server exactly as to its own subprocess."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.pid = None
+        self.stdin = _SocketWriter(sock)
+        self.stdout = sock.makefile("rb", buffering=0)
+        self.stderr = None  # the server's stderr stays with the broker
+        self.returncode: int | None = None
+
+    def poll(self) -> int | None:
+        return self.returncode
+
+    def terminate(self) -> None:
+        if self.returncode is None:
+            self.returncode = 0
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+
+    kill = terminate
+
+    def wait(self, timeout: float | None = None) -> int | None:
+        return self.returncode
+
+
+def tools_cache_path() -> str:
+    """Where `tools/list` results are cached: `$SEMGREP_MCP_TOOLS_CACHE`,
+    else `security-audit/mcp-tools.json` under `$XDG_CACHE_HOME` (or
+    `~/.cache`)."""
+    if os.environ.get("SEMGREP_MCP_TOOLS_CACHE"):
+        return os.environ["SEMGREP_MCP_TOOLS_CACHE"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "security-audit", "mcp-tools.json")
+
+
+def _server_identity(command: list[str] | None) -> str | None:
+    """Cache key for a server command: the command plus the real path, inode
+    and mtime of its executable, so upgrading the binary invalidates it.
+    None if the executable can't be found."""
+    try:
+        command = command or default_command()
+    except SemgrepMCPError:
+        return None
+    path = shutil.which(command[0])
+    if path is None:
+        return None
+    real = os.path.realpath(path)
+    try:
+        st = os.stat(real)
+    except OSError:
+        return None
+    return json.dumps([command, real, st.st_ino, st.st_mtime_ns])
+
+
+def _load_tools_cache() -> dict[str, Any]:
+    try:
+        with open(tools_cache_path(), encoding="utf-8") as handle:
+            payload = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def cached_tools(command: list[str] | None = None, server_version: str | None = None) -> dict[str, dict] | None:
+    """`{name: tool}` from the last `tools/list` of this server build, or
+    None if there is no fresh entry (or it was for another `server_version`,
+    when one is given)."""
+    identity = _server_identity(command)
+    entry = _load_tools_cache().get(identity) if identity else None
+    if not isinstance(entry, dict) or time.time() - entry.get("fetched_at", 0) > TOOLS_CACHE_TTL:
+        return None
+    if server_version is not None and entry.get("server_version") != server_version:
+        return None
+    return {tool["name"]: tool for tool in entry.get("tools", []) if isinstance(tool, dict) and "name" in tool}
+
+
+def record_tools(command: list[str] | None, server_version: str | None, tools: list[dict]) -> None:
+    """Store a `tools/list` result for `cached_tools`. Best effort: an
+    unwritable cache only costs a `tools/list` next time."""
+    identity = _server_identity(command)
+    if identity is None:
+        return
+    path = tools_cache_path()
+    cache = _load_tools_cache()
+    cache[identity] = {"server_version": server_version, "fetched_at": time.time(), "tools": tools}
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(partial, "w", encoding="utf-8") as handle:
+            json.dump(cache, handle, indent=2, sort_keys=True)
+        os.replace(partial, path)
+    except OSError:
+        pass
+
+
+def check_tools(tools: dict[str, dict], required: dict[str, Any]) -> list[str]:
+    """Problems with calling each `required` tool with the given argument
+    names, judged from its `inputSchema`: the tool is missing, an argument
+    isn't declared (unless the schema allows additional properties), or
+    the schema requires an argument that isn't being sent."""
+    problems = []
+    for name, arguments in required.items():
+        tool = tools.get(name)
+        if tool is None:
+            problems.append(f"no tool {name!r} (server has: {', '.join(sorted(tools)) or 'none'})")
+            continue
+        schema = tool.get("inputSchema") or {}
+        declared = schema.get("properties") or {}
+        sent = set(arguments)
+        if declared and schema.get("additionalProperties") is not True:
+            for argument in sorted(sent - set(declared)):
+                problems.append(f"{name} does not accept {argument!r}")
+        for argument in sorted(set(schema.get("required") or []) - sent):
+            problems.append(f"{name} requires {argument!r}")
+    return problems
+
+
+def _with_progress_token(params: dict[str, Any], token: int) -> dict[str, Any]:
+    """Copy of `params` carrying `_meta.progressToken`, which asks the server
+    to send `notifications/progress` for this request."""
+    return {**params, "_meta": {**(params.get("_meta") or {}), "progressToken": token}}
+
+
+def _report_progress(callback: ProgressCallback | None, params: dict[str, Any]) -> None:
+    if callback is None:
+        return
+    try:
+        callback(params.get("progress", 0), params.get("total"), params.get("message"))
+    except Exception:
+        pass  # a broken progress display must not take the transport down
+
+
+def _rpc_error(err: Any) -> "SemgrepMCPError":
+    if not isinstance(err, dict):
+        return SemgrepMCPError(f"MCP server error: {err}")
+    return SemgrepMCPError(f"MCP server error: {err.get('message', err)} (code={err.get('code')})")
+
+
+class StderrDrain:
+    """Continuously read a server's stderr so a chatty server never blocks
+    on a full pipe. Keeps the last `tail_kb` KB in memory for error
+    messages and optionally copies everything to `log_path`."""
+
+    def __init__(self, pipe, tail_kb: int = STDERR_TAIL_KB, log_path: str | None = None) -> None:
+        self.limit = tail_kb * 1024
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._log = open(log_path, "ab") if log_path else None
+        self._fd = pipe.fileno() if pipe is not None else None
+        self._thread = threading.Thread(target=self._run, name="mcp-stderr", daemon=True)
+        if self._fd is not None:
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                chunk = os.read(self._fd, 1 << 16)
+                if not chunk:
+                    break
+                self.feed(chunk)
+        except OSError:
+            pass
+        finally:
+            self.finish()
+
+    def feed(self, chunk: bytes) -> None:
+        """Record a chunk of stderr. Public so a reader other than the
+        drain thread (AsyncMCPClient's stream task) can share the buffer."""
+        with self._lock:
+            self._buffer += chunk
+            if len(self._buffer) > self.limit:
+                del self._buffer[: len(self._buffer) - self.limit]
+        if self._log is not None:
+            self._log.write(chunk)
+            self._log.flush()
+
+    def finish(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def tail(self) -> str:
+        with self._lock:
+            return self._buffer.decode("utf-8", errors="replace")
+
+    def error(self, reason: str) -> "SemgrepMCPError":
+        """Build a transport error carrying the server's recent stderr,
+        which is usually where the actual cause is."""
+        tail = self.tail().strip()
+        if tail:
+            reason = f"{reason}\n--- server stderr (last {self.limit // 1024} KB) ---\n{tail}"
+        return SemgrepMCPError(reason)
+
+    def join(self, timeout: float) -> None:
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+
+# Requests that can be resent to a fresh server without side effects. Every
+# semgrep tool only reads the tree (a rewritten sarif_output is identical).
+IDEMPOTENT_METHODS = frozenset({"ping", "tools/list", "resources/list", "prompts/list"})
+IDEMPOTENT_TOOLS = frozenset({
+    "semgrep_scan",
+    "semgrep_scan_with_custom_rule",
+    "security_check",
+    "get_abstract_syntax_tree",
+    "semgrep_findings",
+    "get_supported_languages",
+    "supported_languages",
+    "semgrep_rule_schema",
+})
+
+
+@dataclass
+class _Call:
+    """What's needed to resend a request after a respawn."""
+
+    method: str
+    params: dict[str, Any]
+    idempotent: bool
+    retries: int
+    sent: bool = False
+
+
 class SemgrepMCPClient:
     """Spawn the Semgrep MCP server and talk to it over stdio JSON-RPC.
 
@@ -47,57 +511,135 @@ class SemgrepMCPClient:
     This client only implements the tools/call path. For full feature support
     use a proper MCP client library; this exists so the security_audit script
     can opt into MCP without taking on the SDK as a hard dependency.
+
+    A reader thread owns stdout and resolves each response into the future
+    registered for its id, so requests can be pipelined and responses may
+    arrive in any order. Every request has a deadline (`timeout`, default
+    DEFAULT_TIMEOUT); an overdue request fails with SemgrepMCPError, the
+    server is sent `notifications/cancelled`, and a late response to that id
+    is dropped.
+
+    Requests made with a `progress` callback carry their id as
+    `_meta.progressToken`; matching `notifications/progress` messages are
+    passed to the callback on the reader thread until the request settles.
+
+    The pipes are binary. Messages are encoded with `codec` (see
+    `get_codec`), and stdout is read in READ_CHUNK blocks, so a large
+    result is decoded once from bytes rather than line-buffered as text.
+
+    With `respawn=True` (and a `factory` to start servers, which `spawn`
+    provides) the session survives the server dying: the reader that saw it
+    go starts a new server after an exponential backoff (`backoff` doubling
+    up to `backoff_max`, at most `max_respawns` failed attempts in a row),
+    repeats the handshake and resends outstanding requests. Requests sent to
+    the dead server are resent only if idempotent and within their
+    `retries`; the rest fail. Requests made while it is down wait for the
+    new server. `metrics` reports respawns and downtime.
     """
 
-    def __init__(self, proc: subprocess.Popen[str]) -> None:
+    def __init__(
+        self,
+        proc: subprocess.Popen[bytes],
+        timeout: float = DEFAULT_TIMEOUT,
+        stderr_tail_kb: int = STDERR_TAIL_KB,
+        stderr_log: str | None = None,
+        codec: str | JSONCodec | None = None,
+        factory: Callable[[], Any] | None = None,
+        respawn: bool = False,
+        max_respawns: int = 5,
+        retries: int = 2,
+        backoff: float = 0.5,
+        backoff_max: float = 30.0,
+    ) -> None:
         self.proc = proc
+        self.timeout = timeout
+        self.codec = codec if isinstance(codec, JSONCodec) else get_codec(codec)
+        self._stderr_options = (stderr_tail_kb, stderr_log)
+        self.stderr = StderrDrain(proc.stderr, stderr_tail_kb, stderr_log)
+        self._factory = factory if respawn else None
+        self.max_respawns = max_respawns
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
         self._next_id = 1
         self._initialized = False
+        self.command: list[str] | None = None  # as given to spawn(); keys the tools cache
+        self.server_info: dict[str, Any] = {}
+        self.tools: dict[str, dict] | None = None
+        self._pending: dict[int, Future] = {}
+        self._deadlines: dict[int, float] = {}
+        self._cancelled: set[int] = set()
+        self._progress: dict[int, ProgressCallback] = {}
+        self._calls: dict[int, _Call] = {}
+        self._lock = threading.Lock()  # guards ids, pending, deadlines, progress, calls, proc, stdin
+        self._closed_reason: str | None = None
+        self._healing = False
+        self._closing = threading.Event()
+        self._metrics = {"respawns": 0, "respawn_failures": 0, "downtime_s": 0.0, "retried_calls": 0, "abandoned_calls": 0}
+        # Self-pipe: a new deadline wakes the reader out of select().
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._reader = self._start_reader(proc)
 
-    @classmethod
-    def spawn(cls, command: list[str] | None = None) -> "SemgrepMCPClient":
-        """Spawn the Semgrep MCP server as a subprocess. Auto-detects the
-        invocation if `command` is None: prefers `uvx semgrep-mcp`, falls
-        back to `semgrep-mcp` if installed as a binary."""
+    @staticmethod
+    def start_server(command: list[str] | None = None, use_broker: bool | None = None) -> Any:
+        """Start a server (or attach to the broker) and return the
+        Popen-like handle, without any handshake. `use_broker=None` defers
+        to `broker_enabled()`."""
+        if use_broker is None:
+            use_broker = broker_enabled()
+        if use_broker:
+            sock = connect_broker(command)
+            if sock is not None:
+                return _BrokerProcess(sock)
         if command is None:
-            if shutil.which("uvx"):
-                command = ["uvx", "semgrep-mcp"]
-            elif shutil.which("semgrep-mcp"):
-                command = ["semgrep-mcp"]
-            else:
-                raise SemgrepMCPError(
-                    "Cannot find uvx or semgrep-mcp. Install one of:\n"
-                    "  pipx install uv  (then `uvx semgrep-mcp` will work)\n"
-                    "  pipx install semgrep-mcp"
-                )
-
-        try:
-            proc = subprocess.Popen(
+            command = default_command()
+        try:
+            return subprocess.Popen(
                 command,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
+                bufsize=READ_CHUNK,
             )
         except (OSError, FileNotFoundError) as exc:
             raise SemgrepMCPError(f"Failed to spawn {command}: {exc}") from exc
 
-        client = cls(proc)
-        client._initialize()
+    @classmethod
+    def spawn(cls, command: list[str] | None = None, use_broker: bool | None = None, **options: Any) -> "SemgrepMCPClient":
+        """Spawn the Semgrep MCP server as a subprocess. Auto-detects the
+        invocation if `command` is None: prefers `uvx semgrep-mcp`, falls
+        back to `semgrep-mcp` if installed as a binary. `options` are passed
+        to the constructor (`timeout`, `stderr_tail_kb`, `stderr_log`,
+        `codec`, `respawn`, `max_respawns`, `retries`, `backoff`,
+        `backoff_max`).
+
+        With `use_broker=True`, or `$SEMGREP_MCP_USE_BROKER=1` when it is
+        left as None, and `scripts/mcp_broker.py` running on a socket this
+        user owns, the client attaches to one of the broker's warm servers
+        instead; the handshake then costs a socket round trip rather than a
+        server start. A respawning client started this way reattaches the
+        same way."""
+        client = cls(
+            cls.start_server(command, use_broker),
+            factory=lambda: cls.start_server(command, use_broker),
+            **options,
+        )
+        client.command = command
+        try:
+            client._initialize()
+        except SemgrepMCPError:
+            client.close()
+            raise
         return client
 
+    def _error(self, reason: str) -> SemgrepMCPError:
+        return self.stderr.error(reason)
+
     def _initialize(self) -> None:
         """Send the MCP initialize handshake."""
-        self._send(
-            "initialize",
-            {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {"name": "security-audit-skill", "version": "0.1.0"},
-            },
-        )
-        self._recv()  # discard server info
+        self.server_info = self._send_request("initialize", INITIALIZE_PARAMS, HANDSHAKE_TIMEOUT, handshake=True)[1].result()
         # MCP requires a `notifications/initialized` notification after the
         # handshake. The `notifications/` prefix is critical — sending
         # `initialized` without it (as a previous version of this file did)
@@ -106,75 +648,478 @@ class SemgrepMCPClient:
         self._notify("notifications/initialized", {})
         self._initialized = True
 
-    def _send(self, method: str, params: dict[str, Any]) -> int:
-        """Send a JSON-RPC request, return its id."""
-        if self.proc.stdin is None or self.proc.poll() is not None:
-            raise SemgrepMCPError("MCP server is not running")
-        msg_id = self._next_id
-        self._next_id += 1
-        msg = {"jsonrpc": "2.0", "id": msg_id, "method": method, "params": params}
-        self.proc.stdin.write(json.dumps(msg) + "\n")
-        self.proc.stdin.flush()
-        return msg_id
+    def _send(self, method: str, params: dict[str, Any], timeout: float | None = None) -> int:
+        """Send a JSON-RPC request, return its id. The response future is
+        registered before the write so a fast reply can't be missed."""
+        return self._send_request(method, params, timeout)[0]
+
+    def _send_request(
+        self,
+        method: str,
+        params: dict[str, Any],
+        timeout: float | None = None,
+        progress: ProgressCallback | None = None,
+        idempotent: bool | None = None,
+        handshake: bool = False,
+    ) -> tuple[int, Future]:
+        """Register and write a request. While a respawn is under way the
+        request is only registered and goes out once the new server has
+        finished its handshake (`handshake` requests are that handshake)."""
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS or (method == "tools/call" and params.get("name") in IDEMPOTENT_TOOLS)
+        future: Future = Future()
+        with self._lock:
+            if self._closed_reason or (self._factory is None and (self.proc.stdin is None or self.proc.poll() is not None)):
+                raise self._error(self._closed_reason or "MCP server is not running")
+            msg_id = self._next_id
+            self._next_id += 1
+            self._pending[msg_id] = future
+            self._deadlines[msg_id] = time.monotonic() + (self.timeout if timeout is None else timeout)
+            if progress is not None:
+                self._progress[msg_id] = progress
+            call = _Call(method, params, idempotent, self.retries)
+            if not handshake:
+                self._calls[msg_id] = call
+            if handshake or not self._healing:
+                try:
+                    self._write_call(msg_id, call)
+                except OSError as exc:
+                    if self._factory is None or handshake:
+                        self._forget(msg_id)
+                        raise self._error(f"MCP server is not accepting requests: {exc}") from exc
+                    # The server is dying; the reader will see EOF, respawn
+                    # and send this with the other unsent requests.
+        self._wake()
+        return msg_id, future
+
+    def _write_call(self, msg_id: int, call: _Call) -> None:
+        """Write a registered request. Caller holds the lock."""
+        params = _with_progress_token(call.params, msg_id) if msg_id in self._progress else call.params
+        msg = {"jsonrpc": "2.0", "id": msg_id, "method": call.method, "params": params}
+        self.proc.stdin.write(self.codec.dumps(msg) + b"\n")  # type: ignore[union-attr]
+        self.proc.stdin.flush()  # type: ignore[union-attr]
+        call.sent = True
+
+    def _forget(self, msg_id: int) -> Future | None:
+        """Drop every record of a request. Caller holds the lock."""
+        self._deadlines.pop(msg_id, None)
+        self._progress.pop(msg_id, None)
+        self._calls.pop(msg_id, None)
+        return self._pending.pop(msg_id, None)
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            pass  # pipe full (reader is already due to wake) or closed
+
+    def _request(
+        self,
+        method: str,
+        params: dict[str, Any],
+        timeout: float | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Future:
+        """Send a request; the future resolves to its `result` payload or
+        raises SemgrepMCPError, at the latest once its deadline passes."""
+        return self._send_request(method, params, timeout, progress)[1]
 
     def _notify(self, method: str, params: dict[str, Any]) -> None:
         """Send a JSON-RPC notification (no response expected)."""
-        if self.proc.stdin is None:
-            raise SemgrepMCPError("MCP server is not running")
-        msg = {"jsonrpc": "2.0", "method": method, "params": params}
-        self.proc.stdin.write(json.dumps(msg) + "\n")
-        self.proc.stdin.flush()
-
-    def _recv(self) -> dict[str, Any]:
-        """Read one JSON-RPC response from stdout. Times out after 60s."""
-        if self.proc.stdout is None:
-            raise SemgrepMCPError("MCP server has no stdout")
-        line = self.proc.stdout.readline()
-        if not line:
-            stderr = self.proc.stderr.read() if self.proc.stderr else ""
-            raise SemgrepMCPError(f"MCP server closed unexpectedly. stderr: {stderr.strip()}")
-        try:
-            return json.loads(line)
-        except json.JSONDecodeError as exc:
-            raise SemgrepMCPError(f"Bad JSON from MCP server: {exc} | line: {line!r}") from exc
-
-    def call(self, tool_name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            if self.proc.stdin is None:
+                raise SemgrepMCPError("MCP server is not running")
+            msg = {"jsonrpc": "2.0", "method": method, "params": params}
+            self.proc.stdin.write(self.codec.dumps(msg) + b"\n")
+            self.proc.stdin.flush()
+
+    def _cancel(self, msg_id: int, reason: str) -> None:
+        """Fail request `msg_id` and tell the server to stop working on it.
+        Its id is remembered so a response that still arrives is dropped."""
+        with self._lock:
+            call = self._calls.get(msg_id)
+            future = self._forget(msg_id)
+            if future is None:
+                return  # already answered
+            self._cancelled.add(msg_id)
+        future.set_exception(self._error(reason))
+        if call is not None and not call.sent:
+            return  # never reached a server
+        try:
+            self._notify("notifications/cancelled", {"requestId": msg_id, "reason": reason})
+        except (SemgrepMCPError, OSError, ValueError):
+            pass  # server gone; nothing left to cancel
+
+    def _expire_overdue(self) -> float | None:
+        """Cancel requests past their deadline; return seconds until the
+        next deadline (None if nothing is outstanding)."""
+        now = time.monotonic()
+        with self._lock:
+            overdue = [msg_id for msg_id, deadline in self._deadlines.items() if deadline <= now]
+            upcoming = [deadline for deadline in self._deadlines.values() if deadline > now]
+        for msg_id in overdue:
+            self._cancel(msg_id, f"MCP request {msg_id} timed out")
+        return min(upcoming) - now if upcoming else None
+
+    def _start_reader(self, proc: Any) -> threading.Thread:
+        reader = threading.Thread(target=self._read_loop, args=(proc,), name="mcp-reader", daemon=True)
+        reader.start()
+        return reader
+
+    def _read_loop(self, proc: Any) -> None:
+        """Reader thread for one server process: non-blocking reads off its
+        stdout via a selector, waking at least at the nearest request
+        deadline to expire it. Each complete line is dispatched to its id's
+        future. MCP servers may emit notifications (progress, logging)
+        interleaved with responses; progress goes to the request's callback,
+        anything else is skipped. When the stream ends, hands over to
+        `_disconnected` on this same thread."""
+        stdout = proc.stdout
+        if stdout is None:
+            self._fail_pending("MCP server has no stdout")
+            return
+        fd = stdout.fileno()
+        os.set_blocking(fd, False)
+        selector = selectors.DefaultSelector()
+        selector.register(fd, selectors.EVENT_READ)
+        selector.register(self._wake_r, selectors.EVENT_READ)
+        partial: list[bytes] = []
+        reason = "MCP server closed unexpectedly"
+        try:
+            while True:
+                wait = self._expire_overdue()
+                ready = {key.fd for key, _ in selector.select(wait)}
+                if self._wake_r in ready:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                if fd not in ready:
+                    continue
+                try:
+                    chunk = os.read(fd, READ_CHUNK)
+                except BlockingIOError:
+                    continue
+                except OSError as exc:
+                    reason = f"MCP server stream failed: {exc}"
+                    break
+                if not chunk:
+                    break
+                if b"\n" not in chunk:
+                    partial.append(chunk)
+                    continue
+                *lines, rest = b"".join([*partial, chunk]).split(b"\n")
+                partial = [rest] if rest else []
+                try:
+                    for line in lines:
+                        if line.strip():
+                            self._dispatch(line)
+                except self.codec.errors as exc:
+                    reason = f"Bad JSON from MCP server: {exc} | line: {line[:200]!r}"
+                    break
+        finally:
+            selector.close()
+        self._disconnected(proc, reason)
+
+    def _dispatch(self, line: bytes) -> None:
+        """Resolve the future for one response line. Raises `codec.errors`
+        if the line isn't JSON."""
+        message = self.codec.decode(line)
+        if not isinstance(message, dict):
+            return
+        if "method" in message:
+            if message["method"] == "notifications/progress":
+                params = message.get("params") or {}
+                with self._lock:
+                    callback = self._progress.get(params.get("progressToken"))
+                _report_progress(callback, params)
+            return
+        msg_id = message.get("id")
+        with self._lock:
+            if msg_id in self._cancelled:
+                self._cancelled.discard(msg_id)  # late reply to a timed-out call
+                return
+            future = self._forget(msg_id)
+        if future is None:
+            return
+        if "error" in message:
+            future.set_exception(_rpc_error(message["error"]))
+        else:
+            future.set_result(message.get("result", {}))
+
+    def _disconnected(self, proc: Any, reason: str) -> None:
+        """`proc`'s stream ended. Respawn if allowed, else fail everything."""
+        if self._factory is None or self._closing.is_set() or not self._initialized:
+            self._fail_pending(reason)
+            return
+        with self._lock:
+            healing = self._healing
+            # A replacement died mid-handshake: fail the handshake (the only
+            # requests not in _calls) and let the healer that started it retry.
+            handshake = [self._forget(msg_id) for msg_id in list(self._pending) if msg_id not in self._calls] if healing else []
+        if healing:
+            for future in handshake:
+                if future is not None:
+                    future.set_exception(self._error(reason))
+            return
+        self._heal(proc, reason)
+
+    def _heal(self, dead: Any, reason: str) -> None:
+        """Replace a dead server: fail what can't be retried, start a new
+        one with exponential backoff, handshake, then resend the rest."""
+        down_since = time.monotonic()
+        abandoned: list[tuple[Future, str]] = []
+        with self._lock:
+            self._healing = True
+            self._cancelled.clear()  # ids of the dead session
+            for msg_id, call in list(self._calls.items()):
+                if not call.sent:
+                    continue
+                if call.idempotent and call.retries > 0:
+                    call.retries -= 1
+                    call.sent = False
+                    self._metrics["retried_calls"] += 1
+                    continue
+                why = "not idempotent" if not call.idempotent else "out of retries"
+                future = self._forget(msg_id)
+                if future is not None:
+                    abandoned.append((future, f"{reason}; request {msg_id} not retried ({why})"))
+            self._metrics["abandoned_calls"] += len(abandoned)
+        for future, message in abandoned:
+            future.set_exception(self._error(message))
+        self._reap(dead)
+
+        failures = 0
+        while True:
+            delay = min(self.backoff_max, self.backoff * (2 ** failures))
+            resume = time.monotonic() + delay
+            # Keep expiring deadlines while the server is down.
+            while not self._closing.is_set() and time.monotonic() < resume:
+                next_deadline = self._expire_overdue()
+                self._closing.wait(min(resume - time.monotonic(), next_deadline or delay))
+            if self._closing.is_set():
+                self._fail_pending("MCP client closed while respawning the server")
+                return
+            try:
+                proc = self._factory()  # type: ignore[misc]
+            except SemgrepMCPError as exc:
+                proc, error = None, exc
+            if proc is not None and self._closing.is_set():
+                self._reap(proc)
+                self._fail_pending("MCP client closed while respawning the server")
+                return
+            if proc is not None:
+                with self._lock:
+                    self.proc = proc
+                old_stderr, self.stderr = self.stderr, StderrDrain(proc.stderr, *self._stderr_options)
+                old_stderr.join(1.0)
+                self._reader = self._start_reader(proc)
+                try:
+                    self._initialize()
+                    break
+                except (SemgrepMCPError, OSError) as exc:
+                    error = exc
+                    self._reap(proc)
+            failures += 1
+            self._metrics["respawn_failures"] += 1
+            if failures >= self.max_respawns:
+                self._fail_pending(f"{reason}; gave up after {failures} respawn attempts: {error}")
+                return
+
+        self.tools = None  # the new server may be a different build
+        with self._lock:
+            self._healing = False
+            self._metrics["respawns"] += 1
+            self._metrics["downtime_s"] += time.monotonic() - down_since
+            for msg_id, call in self._calls.items():
+                if not call.sent:
+                    try:
+                        self._write_call(msg_id, call)
+                    except OSError:
+                        break  # died again; its reader will heal and resend
+        self._wake()
+
+    def _reap(self, proc: Any) -> None:
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        try:
+            proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def _fail_pending(self, reason: str) -> None:
+        """Mark the transport dead and fail every outstanding request."""
+        try:
+            self.proc.wait(timeout=0.5)
+            self.stderr.join(1.0)  # let the dying words land in the tail
+        except subprocess.TimeoutExpired:
+            pass  # still running (e.g. bad JSON); report what we have
+        with self._lock:
+            self._closed_reason = self._closed_reason or reason
+            self._healing = False
+            pending, self._pending = self._pending, {}
+            self._deadlines.clear()
+            self._progress.clear()
+            self._calls.clear()
+        for future in pending.values():
+            future.set_exception(self._error(reason))
+
+    @property
+    def server_version(self) -> str | None:
+        return (self.server_info.get("serverInfo") or {}).get("version")
+
+    def list_tools(self, refresh: bool = False) -> dict[str, dict]:
+        """`{name: tool}` for the server's tools. Served from the on-disk
+        cache when it holds this server build at this version; otherwise
+        fetched with `tools/list` (following `nextCursor`) and cached."""
+        if self.tools is not None and not refresh:
+            return self.tools
+        tools = None if refresh else cached_tools(self.command, self.server_version)
+        if tools is None:
+            listed: list[dict] = []
+            cursor = None
+            while True:
+                page = self._request("tools/list", {"cursor": cursor} if cursor else {}, HANDSHAKE_TIMEOUT).result()
+                listed.extend(tool for tool in page.get("tools", []) if isinstance(tool, dict) and "name" in tool)
+                cursor = page.get("nextCursor")
+                if not cursor:
+                    break
+            record_tools(self.command, self.server_version, listed)
+            tools = {tool["name"]: tool for tool in listed}
+        self.tools = tools
+        return tools
+
+    def require(self, required: dict[str, Any]) -> None:
+        """Raise SemgrepMCPError unless the server has every tool in
+        `required` and accepts the argument names listed for it."""
+        problems = check_tools(self.list_tools(), required)
+        if problems:
+            raise SemgrepMCPError("MCP server can't serve this request: " + "; ".join(problems))
+
+    @property
+    def in_flight(self) -> int:
+        """Requests sent and not yet answered, failed or cancelled."""
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def alive(self) -> bool:
+        """True while the session can take requests, including while a
+        respawning client is replacing its server."""
+        if self._closed_reason is not None:
+            return False
+        return self._healing or self.proc.poll() is None
+
+    @property
+    def metrics(self) -> dict[str, Any]:
+        """Self-healing counters: `respawns`, `respawn_failures`,
+        `downtime_s` (total time without a server), `retried_calls`,
+        `abandoned_calls`, and whether a respawn is under way (`healing`)."""
+        with self._lock:
+            return {**self._metrics, "downtime_s": round(self._metrics["downtime_s"], 3), "healing": self._healing}
+
+    def call(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        timeout: float | None = None,
+        progress: ProgressCallback | None = None,
+        idempotent: bool | None = None,
+    ) -> dict[str, Any]:
         """Invoke a tool by name. Returns the parsed `result` payload.
 
-        Raises SemgrepMCPError if the server returns an `error` object.
+        Raises SemgrepMCPError if the server returns an `error` object or
+        no response arrives within `timeout` seconds (default: the client's
+        `timeout`). `progress`, if given, receives the call's progress
+        notifications. `idempotent` overrides whether a respawning client
+        may resend the call (default: true for the read-only semgrep tools
+        in IDEMPOTENT_TOOLS).
         """
+        timeout = self.timeout if timeout is None else timeout
+        future = self.call_async(tool_name, arguments, timeout, progress, idempotent)
+        try:
+            return future.result(timeout + 1.0)  # the reader expires it first
+        except FutureTimeout:
+            raise self._error(f"MCP call {tool_name} timed out after {timeout}s") from None
+
+    def call_async(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        timeout: float | None = None,
+        progress: ProgressCallback | None = None,
+        idempotent: bool | None = None,
+    ) -> Future:
+        """Invoke a tool without waiting. Returns a future that resolves to
+        the `result` payload, or raises SemgrepMCPError from `.result()`
+        (including when the call's deadline passes)."""
         if not self._initialized:
             raise SemgrepMCPError("Client not initialized")
-        msg_id = self._send(
-            "tools/call",
-            {"name": tool_name, "arguments": arguments},
-        )
-        # Loop until we get the matching id; MCP servers may emit other
-        # notifications (progress, etc.) interleaved.
-        while True:
-            response = self._recv()
-            if response.get("id") != msg_id:
-                continue
-            if "error" in response:
-                err = response["error"]
-                raise SemgrepMCPError(
-                    f"MCP server error: {err.get('message', err)} (code={err.get('code')})"
-                )
-            return response.get("result", {})
+        params = {"name": tool_name, "arguments": arguments}
+        return self._send_request("tools/call", params, timeout, progress, idempotent)[1]
+
+    def send_request(
+        self,
+        method: str,
+        params: dict[str, Any],
+        timeout: float | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> tuple[int, Future]:
+        """Send any JSON-RPC request without waiting, for callers that relay
+        traffic (the broker) rather than call tools. Returns the request's id,
+        which `cancel` takes, and a future like `call_async`'s."""
+        return self._send_request(method, params, timeout, progress)
+
+    def notify(self, method: str, params: dict[str, Any]) -> None:
+        """Send a JSON-RPC notification to the server."""
+        self._notify(method, params)
+
+    def cancel(self, msg_id: int, reason: str) -> None:
+        """Fail request `msg_id` with `reason` and tell the server to stop
+        working on it. A no-op once the request has been answered."""
+        self._cancel(msg_id, reason)
+
+    def ping(self, timeout: float = 10.0) -> None:
+        """Round-trip an MCP `ping`; raises SemgrepMCPError if the server
+        doesn't answer within `timeout` seconds."""
+        future = self._request("ping", {}, timeout)
+        try:
+            future.result(timeout + 1.0)  # the reader expires it first
+        except FutureTimeout:
+            raise self._error(f"MCP ping timed out after {timeout}s") from None
 
     def close(self) -> None:
         """Terminate the MCP server subprocess."""
-        if self.proc.poll() is None:
+        self._closing.set()
+        with self._lock:
+            proc = self.proc
+        if proc.poll() is None:
             try:
-                self.proc.stdin.close()  # type: ignore[union-attr]
+                proc.stdin.close()  # type: ignore[union-attr]
             except (OSError, AttributeError):
                 pass
             try:
-                self.proc.terminate()
-                self.proc.wait(timeout=5)
+                proc.terminate()
+                proc.wait(timeout=5)
             except subprocess.TimeoutExpired:
-                self.proc.kill()
-                self.proc.wait()
+                proc.kill()
+                proc.wait()
+        # A reader that was respawning may have started a newer one.
+        reader = None
+        while reader is not self._reader:
+            reader = self._reader
+            reader.join(timeout=5)
+            if self.proc is not proc and self.proc.poll() is None:
+                proc = self.proc
+                proc.terminate()
+        self.stderr.join(timeout=1)
+        if not self._reader.is_alive() and self._wake_r >= 0:
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._wake_r = self._wake_w = -1
 
     def __enter__(self) -> "SemgrepMCPClient":
         return self
@@ -183,8 +1128,240 @@ class SemgrepMCPClient:
         self.close()
 
 
-def is_available(command: list[str] | None = None) -> bool:
-    """Check whether MCP is usable without actually spawning a server."""
+class AsyncMCPClient:
+    """asyncio counterpart of SemgrepMCPClient, built on
+    `asyncio.create_subprocess_exec`, for callers that already run an event
+    loop (e.g. MCP scans alongside other subprocess tools):
+
+        async with await AsyncMCPClient.spawn() as client:
+            results = await asyncio.gather(
+                *(client.call("semgrep_scan", {"path": p}) for p in shards)
+            )
+
+    Same wire protocol and handshake (including `notifications/initialized`).
+    Any number of calls may be in flight; a reader task matches responses to
+    requests by id. Each call has a timeout; when it expires (or the awaiting
+    task is cancelled) the server is sent `notifications/cancelled` and a
+    late response is dropped. stderr is drained into the same ring buffer as
+    the threaded client and attached to transport errors. `call(progress=)`
+    works as in the threaded client; the callback runs on the event loop.
+    """
+
+    def __init__(
+        self,
+        proc: asyncio.subprocess.Process,
+        timeout: float = DEFAULT_TIMEOUT,
+        stderr_tail_kb: int = STDERR_TAIL_KB,
+        stderr_log: str | None = None,
+        codec: str | JSONCodec | None = None,
+    ) -> None:
+        self.proc = proc
+        self.timeout = timeout
+        self.codec = codec if isinstance(codec, JSONCodec) else get_codec(codec)
+        self.stderr = StderrDrain(None, stderr_tail_kb, stderr_log)
+        self._next_id = 1
+        self._initialized = False
+        self._pending: dict[int, asyncio.Future] = {}
+        self._cancelled: set[int] = set()
+        self._progress: dict[int, ProgressCallback] = {}
+        self._write_lock = asyncio.Lock()
+        self._closed_reason: str | None = None
+        self._tasks = [
+            asyncio.ensure_future(self._read_loop()),
+            asyncio.ensure_future(self._drain_stderr()),
+        ]
+
+    @classmethod
+    async def spawn(cls, command: list[str] | None = None, **options: Any) -> "AsyncMCPClient":
+        """Start the server and complete the handshake. `command` and
+        `options` are as for SemgrepMCPClient.spawn."""
+        if command is None:
+            command = default_command()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=READ_CHUNK,
+            )
+        except OSError as exc:
+            raise SemgrepMCPError(f"Failed to spawn {command}: {exc}") from exc
+        client = cls(proc, **options)
+        try:
+            await client._request("initialize", INITIALIZE_PARAMS, HANDSHAKE_TIMEOUT)
+            await client._notify("notifications/initialized", {})
+        except SemgrepMCPError:
+            await client.close()
+            raise
+        client._initialized = True
+        return client
+
+    async def _write(self, message: dict[str, Any]) -> None:
+        if self.proc.stdin is None or self.proc.returncode is not None or self._closed_reason:
+            raise self.stderr.error(self._closed_reason or "MCP server is not running")
+        async with self._write_lock:
+            try:
+                self.proc.stdin.write(self.codec.dumps(message) + b"\n")
+                await self.proc.stdin.drain()
+            except (ConnectionError, OSError) as exc:
+                raise self.stderr.error(f"MCP server is not accepting requests: {exc}") from exc
+
+    async def _notify(self, method: str, params: dict[str, Any]) -> None:
+        await self._write({"jsonrpc": "2.0", "method": method, "params": params})
+
+    async def _request(
+        self,
+        method: str,
+        params: dict[str, Any],
+        timeout: float | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> dict[str, Any]:
+        msg_id = self._next_id
+        self._next_id += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = future
+        if progress is not None:
+            params = _with_progress_token(params, msg_id)
+            self._progress[msg_id] = progress
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            await self._write({"jsonrpc": "2.0", "id": msg_id, "method": method, "params": params})
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            await self._cancel(msg_id, f"MCP request {msg_id} timed out after {timeout}s")
+            raise self.stderr.error(f"MCP {method} timed out after {timeout}s") from None
+        except asyncio.CancelledError:
+            await self._cancel(msg_id, "caller cancelled")
+            raise
+        finally:
+            self._pending.pop(msg_id, None)
+            self._progress.pop(msg_id, None)
+
+    async def _cancel(self, msg_id: int, reason: str) -> None:
+        if self._pending.pop(msg_id, None) is None:
+            return
+        self._cancelled.add(msg_id)
+        try:
+            await self._notify("notifications/cancelled", {"requestId": msg_id, "reason": reason})
+        except SemgrepMCPError:
+            pass
+
+    async def _read_loop(self) -> None:
+        # Chunked reads rather than readline(): StreamReader caps a line at
+        # its buffer limit, far below a large scan result.
+        stdout = self.proc.stdout
+        partial: list[bytes] = []
+        reason = "MCP server closed unexpectedly"
+        while stdout is not None:
+            chunk = await stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            if b"\n" not in chunk:
+                partial.append(chunk)
+                continue
+            *lines, rest = b"".join([*partial, chunk]).split(b"\n")
+            partial = [rest] if rest else []
+            try:
+                for line in lines:
+                    if line.strip():
+                        self._dispatch(self.codec.decode(line))
+            except self.codec.errors as exc:
+                reason = f"Bad JSON from MCP server: {exc}"
+                break
+        await self._fail_pending(reason)
+
+    def _dispatch(self, message: Any) -> None:
+        if not isinstance(message, dict):
+            return
+        if "method" in message:
+            if message["method"] == "notifications/progress":
+                params = message.get("params") or {}
+                _report_progress(self._progress.get(params.get("progressToken")), params)
+            return
+        msg_id = message.get("id")
+        if msg_id in self._cancelled:
+            self._cancelled.discard(msg_id)
+            return
+        future = self._pending.pop(msg_id, None)
+        if future is None or future.done():
+            return
+        if "error" in message:
+            future.set_exception(_rpc_error(message["error"]))
+        else:
+            future.set_result(message.get("result", {}))
+
+    async def _drain_stderr(self) -> None:
+        while self.proc.stderr is not None:
+            chunk = await self.proc.stderr.read(1 << 16)
+            if not chunk:
+                break
+            self.stderr.feed(chunk)
+
+    async def _fail_pending(self, reason: str) -> None:
+        try:
+            await asyncio.wait_for(asyncio.shield(self._tasks[1]), 1.0)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._closed_reason = self._closed_reason or reason
+        pending, self._pending = self._pending, {}
+        self._progress.clear()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(self.stderr.error(reason))
+
+    async def call(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        timeout: float | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> dict[str, Any]:
+        """Invoke a tool by name and await its `result` payload. Raises
+        SemgrepMCPError on a server error, transport failure or timeout."""
+        if not self._initialized:
+            raise SemgrepMCPError("Client not initialized")
+        return await self._request("tools/call", {"name": tool_name, "arguments": arguments}, timeout, progress)
+
+    async def close(self) -> None:
+        """Terminate the server and stop the reader tasks."""
+        if self.proc.returncode is None:
+            if self.proc.stdin is not None:
+                self.proc.stdin.close()
+            try:
+                self.proc.terminate()
+                await asyncio.wait_for(self.proc.wait(), 5)
+            except ProcessLookupError:
+                pass
+            except asyncio.TimeoutError:
+                self.proc.kill()
+                await self.proc.wait()
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.stderr.finish()
+
+    async def __aenter__(self) -> "AsyncMCPClient":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+
+def is_available(command: list[str] | None = None, required: dict[str, Any] | None = None) -> bool:
+    """Check whether MCP is usable without actually spawning a server.
+
+    With `required` (`{tool: [argument, ...]}`), a cached `tools/list` for
+    this server build that shows a missing tool or argument answers False
+    straight away; with no cache entry the server gets the benefit of the
+    doubt and the caller should `require()` after spawning."""
+    if required:
+        tools = cached_tools(command)
+        if tools is not None and check_tools(tools, required):
+            return False
+    if broker_enabled() and broker_socket_problem(broker_socket_path()) is None:
+        return True
     if command is not None:
         return shutil.which(command[0]) is not None
     return shutil.which("uvx") is not None or shutil.which("semgrep-mcp") is not None
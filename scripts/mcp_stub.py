@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""Stand-in Semgrep MCP server for offline benchmarks and client testing.
+
+The real server is deprecated or needs the Pro engine (see
+`skills/security-audit/references/mcp-integration.md`), so this speaks the
+same newline-delimited JSON-RPC on stdio and answers from either a recorded
+session or synthesized semgrep results:
+
+    python3 scripts/mcp_stub.py serve --latency 0.05 --findings 5000
+    python3 scripts/mcp_stub.py serve --recording session.jsonl
+
+`record` sits between a client and a real server, passing traffic through
+unchanged and logging every message with its timestamp, so a real session
+can be replayed later with `serve --recording`:
+
+    python3 scripts/mcp_stub.py record --out session.jsonl -- uvx semgrep-mcp
+
+Either mode is used as the client's server command:
+
+    SemgrepMCPClient.spawn([sys.executable, "scripts/mcp_stub.py", "serve", ...])
+
+Recording format: one JSON object per line,
+`{"t": <seconds since start>, "dir": "request" | "response", "message": {...}}`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+SERVER_INFO = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {"tools": {}},
+    "serverInfo": {"name": "semgrep-mcp-stub", "version": "0.1.0"},
+}
+
+TOOLS = [
+    {
+        "name": "semgrep_scan",
+        "description": "Scan files with Semgrep (stub: returns synthesized findings).",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string"},
+                "targets": {"type": "array", "items": {"type": "string"}},
+                "config": {"type": "string"},
+                "sarif_output": {"type": "string"},
+                "baseline_commit": {"type": "string"},
+            },
+            "required": ["path"],
+        },
+    },
+    {
+        "name": "supported_languages",
+        "description": "Languages Semgrep can scan.",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+]
+
+RULES = [
+    ("python.lang.security.audit.eval-detected", "CWE-95", "A03:2021 - Injection"),
+    ("python.lang.security.audit.subprocess-shell-true", "CWE-78", "A03:2021 - Injection"),
+    ("javascript.browser.security.insecure-document-method", "CWE-79", "A03:2021 - Injection"),
+    ("generic.secrets.security.detected-generic-api-key", "CWE-798", "A07:2021 - Identification and Authentication Failures"),
+    ("python.django.security.audit.unvalidated-password", "CWE-521", "A07:2021 - Identification and Authentication Failures"),
+    ("yaml.github-actions.security.run-shell-injection", "CWE-78", "A03:2021 - Injection"),
+]
+
+
+def semgrep_finding(rng: random.Random, index: int) -> dict[str, Any]:
+    rule, cwe, owasp = rng.choice(RULES)
+    path = f"src/{rng.choice(['api', 'core', 'web', 'jobs'])}/module_{index % 997}.py"
+    line = rng.randint(1, 2000)
+    snippet = "    result = eval(request.args.get('expr'))  # noqa"
+    return {
+        "check_id": rule,
+        "path": path,
+        "start": {"line": line, "col": 14, "offset": line * 40 + 14},
+        "end": {"line": line, "col": 51, "offset": line * 40 + 51},
+        "extra": {
+            "message": f"Detected use of {rule.rsplit('.', 1)[-1]}. Untrusted input reaching this sink can lead to code execution.",
+            "metadata": {
+                "cwe": [f"{cwe}: Improper Neutralization"],
+                "owasp": [owasp],
+                "confidence": rng.choice(["LOW", "MEDIUM", "HIGH"]),
+                "likelihood": rng.choice(["LOW", "MEDIUM", "HIGH"]),
+                "impact": rng.choice(["LOW", "MEDIUM", "HIGH"]),
+                "references": [f"https://semgrep.dev/r/{rule}", "https://owasp.org/Top10/"],
+                "source": f"https://semgrep.dev/r/{rule}",
+                "category": "security",
+                "technology": ["python"],
+            },
+            "severity": rng.choice(["INFO", "WARNING", "ERROR"]),
+            "fingerprint": "%064x" % rng.getrandbits(256),
+            "lines": snippet,
+            "is_ignored": False,
+            "validation_state": "NO_VALIDATOR",
+            "engine_kind": "OSS",
+        },
+    }
+
+
+def scan_result(findings: int, seed: int = 0) -> dict[str, Any]:
+    """A `semgrep_scan` result payload with `findings` semgrep results."""
+    rng = random.Random(seed)
+    results = [semgrep_finding(rng, index) for index in range(findings)]
+    return {
+        "version": "1.120.0",
+        "results": results,
+        "errors": [],
+        "paths": {"scanned": sorted({result["path"] for result in results})},
+        "skipped_rules": [],
+    }
+
+
+def scan_response(findings: int, seed: int = 0) -> dict[str, Any]:
+    """The full JSON-RPC response line `SemgrepMCPClient` decodes for a
+    `semgrep_scan` call returning `findings` results."""
+    return {"jsonrpc": "2.0", "id": 2, "result": scan_result(findings, seed)}
+
+
+def request_key(message: dict[str, Any]) -> str:
+    """What a replayed request is matched on: method and params, minus
+    per-session noise (`_meta` carries the progress token)."""
+    params = {key: value for key, value in (message.get("params") or {}).items() if key != "_meta"}
+    return json.dumps([message.get("method"), params], sort_keys=True)
+
+
+def tool_key(message: dict[str, Any]) -> str:
+    """Looser match for requests with no exact recording: same method and
+    tool, any arguments."""
+    return json.dumps([message.get("method"), (message.get("params") or {}).get("name")])
+
+
+def load_recording(path: Path) -> dict[str, list[tuple[dict[str, Any], float]]]:
+    """`{request_key: [(response_without_id, latency_s), ...]}` from a
+    `record` log, pairing requests and responses by id. Each response is
+    filed under both `request_key` and `tool_key`. Repeated requests replay
+    their responses in recorded order."""
+    requests: dict[Any, tuple[dict[str, Any], float]] = {}
+    replies: dict[str, list[tuple[dict[str, Any], float]]] = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        message = entry["message"]
+        if not isinstance(message, dict) or "id" not in message:
+            continue
+        if entry["dir"] == "request" and "method" in message:
+            requests[message["id"]] = (message, entry["t"])
+        elif entry["dir"] == "response" and message["id"] in requests:
+            request, sent = requests.pop(message["id"])
+            reply = {name: value for name, value in message.items() if name in ("result", "error")}
+            for key in (request_key(request), tool_key(request)):
+                replies.setdefault(key, []).append((reply, max(0.0, entry["t"] - sent)))
+    return replies
+
+
+class StubServer:
+    """Answers requests on a scheduler thread so any number can be pending
+    at once: each response is queued for `now + latency` and written when
+    due, unless `notifications/cancelled` arrived for it first."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.latency = args.latency
+        self.jitter = args.jitter
+        self.progress_steps = args.progress_steps
+        self.fail_rate = args.fail_rate
+        self.crash_after = args.crash_after
+        self.calls = 0
+        self.rng = random.Random(args.seed)
+        self.recording = load_recording(Path(args.recording)) if args.recording else {}
+        self.replayed: dict[str, int] = {}
+        # The scan payload is encoded once; each reply only splices in its id.
+        self.scan_payload = json.dumps(scan_result(args.findings, args.seed)).encode()
+        self.out = sys.stdout.buffer
+        self.write_lock = threading.Lock()
+        self.queue: list[tuple[float, int, Any, bytes]] = []
+        self.cancelled: set[Any] = set()
+        self.sequence = 0
+        self.ready = threading.Condition()
+        self.closed = False
+
+    def write(self, data: bytes) -> None:
+        with self.write_lock:
+            self.out.write(data + b"\n")
+            self.out.flush()
+
+    def reply(self, msg_id: Any, result: Any = None, error: dict | None = None) -> bytes:
+        body = {"jsonrpc": "2.0", "id": msg_id}
+        body.update({"error": error} if error is not None else {"result": result})
+        return json.dumps(body).encode()
+
+    def delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def schedule(self, due: float, msg_id: Any, data: bytes) -> None:
+        with self.ready:
+            self.sequence += 1
+            heapq.heappush(self.queue, (due, self.sequence, msg_id, data))
+            self.ready.notify()
+
+    def run_scheduler(self) -> None:
+        while True:
+            with self.ready:
+                while not self.queue or self.queue[0][0] > time.monotonic():
+                    if self.closed and not self.queue:
+                        return
+                    self.ready.wait(None if not self.queue else self.queue[0][0] - time.monotonic())
+                _, _, msg_id, data = heapq.heappop(self.queue)
+                if msg_id in self.cancelled:
+                    self.cancelled.discard(msg_id)
+                    continue
+            self.write(data)
+
+    def replay(self, message: dict[str, Any]) -> tuple[bytes, float] | None:
+        key = request_key(message)
+        if key not in self.recording:
+            key = tool_key(message)
+        recorded = self.recording.get(key)
+        if not recorded:
+            return None
+        index = self.replayed.get(key, 0)
+        self.replayed[key] = index + 1
+        reply, latency = recorded[index % len(recorded)]
+        body = {"jsonrpc": "2.0", "id": message["id"], **reply}
+        return json.dumps(body).encode(), latency
+
+    def handle(self, message: dict[str, Any]) -> None:
+        method = message.get("method")
+        params = message.get("params") or {}
+        if "id" not in message:
+            if method == "notifications/cancelled":
+                with self.ready:
+                    self.cancelled.add(params.get("requestId"))
+            return
+        msg_id = message["id"]
+        now = time.monotonic()
+        if method == "initialize":
+            self.write(self.reply(msg_id, SERVER_INFO))
+            return
+        if method == "ping":
+            self.write(self.reply(msg_id, {}))
+            return
+        replayed = self.replay(message)
+        if replayed is not None:
+            data, latency = replayed
+            self.schedule(now + (self.latency if self.latency else latency), msg_id, data)
+            return
+        if method == "tools/list":
+            self.write(self.reply(msg_id, {"tools": TOOLS}))
+            return
+        if method != "tools/call":
+            self.write(self.reply(msg_id, error={"code": -32601, "message": f"Method not found: {method}"}))
+            return
+        self.calls += 1
+        if self.crash_after and self.calls >= self.crash_after:
+            print(f"stub: crashing on tools/call #{self.calls}", file=sys.stderr, flush=True)
+            os._exit(70)
+        delay = self.delay()
+        token = (params.get("_meta") or {}).get("progressToken")
+        if token is not None:
+            for step in range(1, self.progress_steps + 1):
+                note = {
+                    "jsonrpc": "2.0",
+                    "method": "notifications/progress",
+                    "params": {"progressToken": token, "progress": step, "total": self.progress_steps},
+                }
+                self.schedule(now + delay * step / (self.progress_steps + 1), None, json.dumps(note).encode())
+        if self.fail_rate and self.rng.random() < self.fail_rate:
+            data = self.reply(msg_id, error={"code": -32000, "message": "stub: injected failure"})
+        elif params.get("name") == "semgrep_scan":
+            data = b'{"jsonrpc": "2.0", "id": ' + json.dumps(msg_id).encode() + b', "result": ' + self.scan_payload + b"}"
+        else:
+            data = self.reply(msg_id, {"content": [{"type": "text", "text": "{}"}]})
+        self.schedule(now + delay, msg_id, data)
+
+    def serve(self) -> int:
+        scheduler = threading.Thread(target=self.run_scheduler, name="stub-scheduler", daemon=True)
+        scheduler.start()
+        for line in sys.stdin.buffer:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                self.write(self.reply(None, error={"code": -32700, "message": "Parse error"}))
+                continue
+            if isinstance(message, dict):
+                self.handle(message)
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+        scheduler.join()
+        return 0
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    return StubServer(args).serve()
+
+
+def cmd_record(args: argparse.Namespace) -> int:
+    command = args.server[1:] if args.server[:1] == ["--"] else args.server
+    if not command:
+        print("record needs a server command after --", file=sys.stderr)
+        return 2
+    started = time.monotonic()
+    log = open(args.out, "a", encoding="utf-8")
+    log_lock = threading.Lock()
+    # stderr is inherited, so the client's drain still sees the real server's.
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def note(direction: str, line: bytes) -> None:
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            message = line.decode("utf-8", errors="replace").rstrip("\n")
+        entry = {"t": round(time.monotonic() - started, 6), "dir": direction, "message": message}
+        with log_lock:
+            log.write(json.dumps(entry) + "\n")
+            log.flush()
+
+    def pump_requests() -> None:
+        for line in sys.stdin.buffer:
+            note("request", line)
+            try:
+                proc.stdin.write(line)  # type: ignore[union-attr]
+                proc.stdin.flush()  # type: ignore[union-attr]
+            except OSError:
+                break
+        try:
+            proc.stdin.close()  # type: ignore[union-attr]
+        except OSError:
+            pass
+
+    threading.Thread(target=pump_requests, name="record-requests", daemon=True).start()
+    out = sys.stdout.buffer
+    for line in proc.stdout:  # type: ignore[union-attr]
+        note("response", line)
+        out.write(line)
+        out.flush()
+    returncode = proc.wait()
+    log.close()
+    return returncode
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Act as an MCP server on stdio.")
+    serve.add_argument("--recording", help="Replay responses from this `record` log (exact request first, else any call of the same tool); the rest get synthesized answers.")
+    serve.add_argument("--latency", type=float, default=0.0, help="Seconds before each tools/call reply (overrides recorded timing). Default: 0.")
+    serve.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on --latency, in seconds. Default: 0.")
+    serve.add_argument("--findings", type=int, default=100, help="Findings in each synthesized semgrep_scan result. Default: 100.")
+    serve.add_argument("--progress-steps", type=int, default=0, help="Progress notifications per call that asks for them. Default: 0.")
+    serve.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of tools/call requests answered with an error. Default: 0.")
+    serve.add_argument("--crash-after", type=int, default=0, help="Exit abruptly on receiving this many tools/call requests (each new process counts afresh). Default: never.")
+    serve.add_argument("--seed", type=int, default=0)
+    serve.set_defaults(func=cmd_serve)
+
+    record = subparsers.add_parser("record", help="Proxy to a real server, logging the session for replay.")
+    record.add_argument("--out", required=True, help="Append the session log here.")
+    record.add_argument("server", nargs=argparse.REMAINDER, help="-- followed by the real server command.")
+    record.set_defaults(func=cmd_record)
+    return parser
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -16,19 +16,97 @@ It intentionally does not attempt LLM verification, deduplication, or patching.
 from __future__ import annotations
 
 import argparse
+import gzip
+import io
 import json
 import os
 import re
 import shutil
+import signal
 import subprocess
 import sys
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, appends are best-effort
+    fcntl = None  # type: ignore[assignment]
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, tools run unconstrained
+    resource = None  # type: ignore[assignment]
+try:
+    import zstandard
+except ImportError:  # optional; `zstd` compression falls back to gzip
+    zstandard = None  # type: ignore[assignment]
+
+# What reading a damaged artifact can raise: gzip's BadGzipFile is an
+# OSError, a truncated stream an EOFError, bad bytes a UnicodeDecodeError
+# (a ValueError, like JSONDecodeError), and zstandard its own ZstdError.
+ARTIFACT_READ_ERRORS: tuple[type[Exception], ...] = (OSError, EOFError, ValueError) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
 
 
 ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_OUTPUT_DIR = ROOT / ".artifacts" / "security-audit"
+LEDGER_DIR = ROOT / ".claude" / "security-audit"
+RULE_STATS_LEDGER = LEDGER_DIR / "rule-stats.jsonl"
+PENDING_MEMORIES_LEDGER = LEDGER_DIR / "pending-memories.jsonl"
+VERDICTS = {"fp", "tp", "unconfirmed"}
+AUDIT_CONFIG = LEDGER_DIR / "config.json"
+DEFAULT_CONFIG: dict[str, dict] = {
+    # Files the per-file scanners (lizard, bandit, eslint) never see. Lockfiles
+    # are still visible to the dependency scanners, which take the repo root.
+    "prefilter": {
+        "enabled": True,
+        "honor_gitattributes": True,
+        "max_file_bytes": 1_000_000,
+        # A bundle counts as minified when its average line length exceeds
+        # `minified_avg_line_length`. Only files with a `minified_extensions`
+        # suffix are checked, so one long line never hides a source file
+        # from the scanners.
+        "minified_avg_line_length": 500,
+        "minified_extensions": [".js", ".mjs", ".cjs", ".css", ".map"],
+        "exclude_globs": [
+            "**/node_modules/**",
+            "**/vendor/**",
+            "**/third_party/**",
+            "**/__snapshots__/**",
+            "*.min.js",
+            "*.min.css",
+            "*.map",
+            "*.snap",
+            "package-lock.json",
+            "yarn.lock",
+            "pnpm-lock.yaml",
+            "poetry.lock",
+            "Cargo.lock",
+            "go.sum",
+            "composer.lock",
+            "Gemfile.lock",
+        ],
+    },
+    # Per-tool resource limits applied in the child before exec. Keys are
+    # plan names (`semgrep`, `trivy`, ...) or `default`; each maps to any of
+    # `memory_mb` (RLIMIT_AS), `cpu_seconds` (RLIMIT_CPU) and `nice`.
+    "limits": {},
+    # Tool artifacts can be compressed after each run (`gzip` or `zstd`);
+    # `gc` trims artifact directories to `budget_mb`, evicting entries older
+    # than `max_age_days` first, then least recently used.
+    "artifacts": {
+        "compression": None,
+        "budget_mb": 1024,
+        "max_age_days": 30,
+    },
+}
+ARTIFACT_DIRS = [DEFAULT_OUTPUT_DIR, ROOT / ".artifacts" / "code-quality"]
+COMPRESSED_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
 
 
 @dataclass
@@ -42,6 +120,9 @@ class CommandResult:
     stdout: str
     stderr: str
     skipped_reason: str | None = None
+    duration_s: float | None = None
+    resource_usage: dict | None = None
+    shards: list[dict] | None = None
 
 
 def run(cmd: list[str], check: bool = True, capture: bool = True) -> subprocess.CompletedProcess[str]:
@@ -54,8 +135,111 @@ def run(cmd: list[str], check: bool = True, capture: bool = True) -> subprocess.
     )
 
 
+# Binaries whose version flag isn't `--version`.
+VERSION_ARGS = {
+    "gitleaks": ["version"],
+    "govulncheck": ["-version"],
+}
+
+
+class ToolRegistry:
+    """Session-wide scanner discovery.
+
+    `which` is resolved once per binary per process. `version` runs the
+    binary's version flag at most once per installed build. Successful
+    probes persist in a JSON file (see `attach`) keyed by the binary's real
+    path, inode and mtime, so an upgrade invalidates the entry and an
+    unchanged binary is never executed again; a failed probe is retried by
+    the next process. Result caches key on the recorded version.
+    """
+
+    def __init__(self) -> None:
+        self.paths: dict[str, str | None] = {}
+        self.versions: dict[str, str | None] = {}
+        self.cache_path: Path | None = None
+        self._disk: dict[str, str | None] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, cache_path: Path) -> None:
+        """Back version probes with `cache_path` (created on first write)."""
+        payload = load_json(cache_path)
+        with self._lock:
+            self.cache_path = cache_path
+            self._disk = payload if isinstance(payload, dict) else {}
+
+    def which(self, name: str) -> str | None:
+        with self._lock:
+            if name not in self.paths:
+                self.paths[name] = shutil.which(name)
+            return self.paths[name]
+
+    def version(self, name: str) -> str | None:
+        path = self.which(name)
+        if path is None:
+            return None
+        with self._lock:
+            if name in self.versions:
+                return self.versions[name]
+        real = os.path.realpath(path)
+        try:
+            st = os.stat(real)
+        except OSError:
+            return None
+        key = f"{real}:{st.st_ino}:{st.st_mtime_ns}"
+        with self._lock:
+            version = self._disk.get(key)
+        if version is None:
+            # Probe outside the lock so `watch`'s pool can probe different
+            # binaries in parallel; the store and save below are serialized.
+            version = self._probe(path, name)
+        with self._lock:
+            if version is not None and self._disk.get(key) != version:
+                self._disk[key] = version
+                self._save()
+            self.versions[name] = version
+        return version
+
+    @staticmethod
+    def _probe(path: str, name: str) -> str | None:
+        try:
+            proc = subprocess.run(
+                [path, *VERSION_ARGS.get(name, ["--version"])],
+                # Never hand the probe our stdin: under the pre-push hook
+                # that is git's ref list, and a tool that reads it blocks.
+                stdin=subprocess.DEVNULL,
+                text=True, capture_output=True, check=False, timeout=30,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if proc.returncode != 0:
+            return None
+        for line in (proc.stdout or proc.stderr).splitlines():
+            if line.strip():
+                return line.strip()
+        return None
+
+    def _save(self) -> None:
+        """Write the probe cache. Caller holds the lock."""
+        if self.cache_path is None:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.cache_path.with_name(f"{self.cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        partial.write_text(json.dumps(self._disk, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        os.replace(partial, self.cache_path)
+
+    def snapshot(self) -> dict[str, dict]:
+        """`{binary: {path, version}}` for every binary probed this session."""
+        return {
+            name: {"path": self.paths.get(name), "version": version}
+            for name, version in sorted(self.versions.items())
+        }
+
+
+TOOLS = ToolRegistry()
+
+
 def command_exists(name: str) -> bool:
-    return shutil.which(name) is not None
+    return TOOLS.which(name) is not None
 
 
 def git_changed_files(base: str) -> list[str]:
@@ -66,6 +250,37 @@ def git_changed_files(base: str) -> list[str]:
     return [line.strip() for line in result.stdout.splitlines() if line.strip()]
 
 
+def read_path_list(source: str) -> list[str]:
+    """Read a NUL-delimited path list from a file, or stdin when `source` is
+    `-`. Streams in chunks so very large lists never sit in memory twice.
+    Paths are made repo-relative; duplicates and blanks are dropped."""
+    stream = sys.stdin.buffer if source == "-" else open(source, "rb")
+    seen: dict[str, None] = {}
+
+    def add(raw: bytes) -> None:
+        path = raw.decode("utf-8", "surrogateescape").strip()
+        if not path:
+            return
+        if os.path.isabs(path):
+            try:
+                path = str(Path(path).resolve().relative_to(ROOT))
+            except ValueError:
+                return  # outside the repo
+        seen.setdefault(path[2:] if path.startswith("./") else path, None)
+
+    try:
+        pending = b""
+        while chunk := stream.read(1 << 16):
+            *complete, pending = (pending + chunk).split(b"\0")
+            for raw in complete:
+                add(raw)
+        add(pending)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    return list(seen)
+
+
 def merge_base(base: str) -> str:
     try:
         result = run(["git", "merge-base", "HEAD", base])
@@ -79,13 +294,106 @@ def write_text(path: Path, content: str) -> None:
     path.write_text(content, encoding="utf-8")
 
 
+def resolve_artifact(path: Path) -> Path:
+    """Return `path`, or its compressed sibling (`.gz`/`.zst`) when only
+    that exists."""
+    if path.exists():
+        return path
+    for suffix in COMPRESSED_SUFFIXES:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    return path
+
+
+def discard_artifact(path: Path) -> None:
+    """Remove an artifact and any compressed sibling left by an earlier run,
+    so nothing downstream mistakes the old output for this run's."""
+    for candidate in (path, *(path.with_name(path.name + suffix) for suffix in COMPRESSED_SUFFIXES)):
+        candidate.unlink(missing_ok=True)
+
+
+def artifact_suffix(path: Path) -> str:
+    """The format suffix of an artifact, ignoring any compression suffix."""
+    if path.suffix in COMPRESSED_SUFFIXES:
+        return Path(path.stem).suffix
+    return path.suffix
+
+
+def open_artifact(path: Path) -> io.TextIOBase:
+    """Open an artifact for reading text, decompressing `.gz`/`.zst`
+    transparently."""
+    path = resolve_artifact(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise OSError(f"zstandard is not installed; cannot read {path}")
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(path.open("rb")),
+            encoding="utf-8",
+            errors="replace",
+        )
+    return path.open(encoding="utf-8", errors="replace")
+
+
+def compress_artifact(path: Path, codec: str) -> Path:
+    """Stream `path` into `<path>.gz` or `<path>.zst` and remove the
+    original. Returns the compressed path."""
+    if codec == "zstd" and zstandard is None:
+        print("zstandard is not installed; compressing artifacts with gzip", file=sys.stderr)
+        codec = "gzip"
+    suffix = ".zst" if codec == "zstd" else ".gz"
+    target = path.with_name(path.name + suffix)
+    partial = target.with_name(target.name + ".part")
+    with path.open("rb") as src, partial.open("wb") as raw:
+        if codec == "zstd":
+            with zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(partial, target)
+    path.unlink()
+    return target
+
+
 def load_json(path: Path) -> dict | list | None:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except (OSError, json.JSONDecodeError):
+        with open_artifact(path) as fp:
+            return json.load(fp)
+    except ARTIFACT_READ_ERRORS:
         return None
 
 
+def load_audit_config(base: str | None, path: str | None = None) -> dict:
+    """Load `.claude/security-audit/config.json` merged over DEFAULT_CONFIG.
+
+    The config can narrow what the scanners see, so it is read from the base
+    ref (like memories, see T2/T8 in the threat model) rather than the
+    working tree; a PR cannot widen its own exclusions. An explicit `path`
+    (the `--config` flag) is read from disk as-is.
+    """
+    payload = None
+    if path:
+        payload = load_json(Path(path))
+        if not isinstance(payload, dict):
+            raise SystemExit(f"Config must be a JSON object: {path}")
+    elif base:
+        shown = run(["git", "show", f"{base}:{AUDIT_CONFIG.relative_to(ROOT).as_posix()}"], check=False)
+        if shown.returncode == 0:
+            try:
+                payload = json.loads(shown.stdout)
+            except json.JSONDecodeError:
+                payload = None
+    config = {section: dict(values) for section, values in DEFAULT_CONFIG.items()}
+    if isinstance(payload, dict):
+        for section, values in payload.items():
+            if isinstance(values, dict):
+                config.setdefault(section, {}).update(values)
+    return config
+
+
 def count_sarif_findings(path: Path) -> int | None:
     payload = load_json(path)
     if not isinstance(payload, dict):
@@ -110,21 +418,238 @@ def count_socket_findings(path: Path) -> int | None:
 
 
 def count_artifact_findings(path: Path) -> int | None:
+    path = resolve_artifact(path)
     if not path.exists():
         return None
-    if path.suffix == ".sarif":
+    if artifact_suffix(path) == ".sarif":
         return count_sarif_findings(path)
-    if path.suffix == ".json":
+    if artifact_suffix(path) == ".json":
         return count_socket_findings(path)
     return None
 
 
+def _finding_id(*parts: object) -> str:
+    import hashlib
+
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+
+
+def iter_sarif_findings(tool: str, path: Path) -> Iterator[dict]:
+    payload = load_json(path)
+    if not isinstance(payload, dict):
+        return
+    for run_item in payload.get("runs", []):
+        if not isinstance(run_item, dict):
+            continue
+        rules = ((run_item.get("tool") or {}).get("driver") or {}).get("rules") or []
+        default_levels = {
+            rule.get("id"): (rule.get("defaultConfiguration") or {}).get("level")
+            for rule in rules
+            if isinstance(rule, dict)
+        }
+        for result in run_item.get("results") or []:
+            if not isinstance(result, dict):
+                continue
+            rule_id = result.get("ruleId") or (result.get("rule") or {}).get("id")
+            location = ((result.get("locations") or [{}])[0] or {}).get("physicalLocation") or {}
+            file_path = (location.get("artifactLocation") or {}).get("uri")
+            line = (location.get("region") or {}).get("startLine")
+            message = (result.get("message") or {}).get("text", "")
+            # Prefer the tool's own fingerprint so identities match what
+            # GitHub code scanning shows; fall back to a content hash that
+            # ignores line numbers.
+            prints = result.get("partialFingerprints") or result.get("fingerprints") or {}
+            fingerprint = next(iter(prints.values()), None) if isinstance(prints, dict) else None
+            yield {
+                "tool": tool,
+                "rule": rule_id,
+                "level": result.get("level") or default_levels.get(rule_id) or "warning",
+                "path": file_path,
+                "line": line,
+                "message": message,
+                "fingerprint": fingerprint or _finding_id(tool, rule_id, file_path, message),
+            }
+
+
+def iter_artifact_findings(tool: str, path: Path) -> Iterator[dict]:
+    """Yield normalized findings (tool, rule, level, path, line, message,
+    fingerprint) from one tool artifact. Formats without per-finding
+    structure (lizard XML) yield nothing."""
+    path = resolve_artifact(path)
+    if not path.exists():
+        return
+    if artifact_suffix(path) == ".sarif":
+        yield from iter_sarif_findings(tool, path)
+        return
+    if tool == "trufflehog":
+        # JSON lines, one verified secret per line.
+        try:
+            with open_artifact(path) as fp:
+                lines = fp.read().splitlines()
+        except ARTIFACT_READ_ERRORS:
+            return
+        for raw in lines:
+            try:
+                item = json.loads(raw)
+            except json.JSONDecodeError:
+                continue
+            data = (item.get("SourceMetadata") or {}).get("Data") or {}
+            meta = next(iter(data.values()), {}) if isinstance(data, dict) and data else {}
+            rule = item.get("DetectorName")
+            file_path = meta.get("file")
+            yield {
+                "tool": tool,
+                "rule": rule,
+                "level": "error" if item.get("Verified") else "warning",
+                "path": file_path,
+                "line": meta.get("line"),
+                "message": f"{rule} secret{' (verified)' if item.get('Verified') else ''}",
+                "fingerprint": _finding_id(tool, rule, file_path, item.get("Raw", "")),
+            }
+        return
+    if artifact_suffix(path) == ".json":
+        payload = load_json(path)
+        items = []
+        if isinstance(payload, dict):
+            items = payload.get("issues") or payload.get("findings") or []
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            rule = item.get("type") or item.get("rule") or item.get("id")
+            file_path = item.get("file") or item.get("path") or item.get("package")
+            message = item.get("description") or item.get("message") or ""
+            yield {
+                "tool": tool,
+                "rule": rule,
+                "level": item.get("severity") or "warning",
+                "path": file_path,
+                "line": item.get("line"),
+                "message": message,
+                "fingerprint": _finding_id(tool, rule, file_path, message),
+            }
+
+
+_OOM_RE = re.compile(r"out of memory|MemoryError|cannot allocate memory|std::bad_alloc|ENOMEM", re.IGNORECASE)
+
+
+def tool_limits(config: dict, name: str) -> dict:
+    """Resolve a tool's limits: the config's `default` entry overlaid with
+    the tool's own entry."""
+    limits = config.get("limits") or {}
+    return {**(limits.get("default") or {}), **(limits.get(name) or {})}
+
+
+# Exec trampoline that applies resource limits to itself and then becomes
+# the tool (same pid), so the limits bind the scanner and anything it
+# spawns but never the runner. A preexec_fn would do the same from the
+# forked child, but it isn't safe while other threads (watch's pool, MCP
+# readers) may hold locks at fork time.
+_LIMIT_TRAMPOLINE = """\
+import os, resource, sys
+nice, memory, cpu = (int(value) for value in sys.argv[1:4])
+if nice:
+    os.nice(nice)
+if memory:
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+if cpu:
+    # SIGXCPU at the soft limit, SIGKILL a few seconds later if ignored.
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 5))
+try:
+    os.execvp(sys.argv[4], sys.argv[4:])
+except OSError as exc:
+    sys.stderr.write(f"{sys.argv[4]}: {exc}\\n")
+    sys.exit(127)
+"""
+
+
+def _limited_command(cmd: list[str], limits: dict) -> list[str]:
+    """Wrap `cmd` in the limit trampoline, or return it unchanged when
+    there is nothing to apply (or no `resource` module to apply it with)."""
+    if resource is None or not limits:
+        return cmd
+    memory = int(limits.get("memory_mb") or 0) * 1024 * 1024
+    cpu = int(limits.get("cpu_seconds") or 0)
+    nice = int(limits.get("nice") or 0)
+    if not (memory or cpu or nice):
+        return cmd
+    return [sys.executable, "-I", "-S", "-c", _LIMIT_TRAMPOLINE, str(nice), str(memory), str(cpu), *cmd]
+
+
+def run_governed(
+    cmd: list[str], limits: dict | None = None, cwd: Path | None = None
+) -> tuple[subprocess.CompletedProcess[str], dict | None]:
+    """`run(cmd, check=False)` with optional resource limits, also returning
+    the child's peak usage (`peak_rss_mb`, `cpu_seconds`) from wait4()."""
+    if not hasattr(os, "wait4"):
+        return subprocess.run(cmd, cwd=cwd or ROOT, text=True, capture_output=True, check=False), None
+    proc = subprocess.Popen(
+        _limited_command(cmd, limits or {}),
+        cwd=cwd or ROOT,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    streams: dict[str, str] = {}
+
+    def drain(name: str, pipe) -> None:
+        streams[name] = pipe.read()
+        pipe.close()
+
+    readers = [
+        threading.Thread(target=drain, args=("stdout", proc.stdout), daemon=True),
+        threading.Thread(target=drain, args=("stderr", proc.stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    # Reap the child ourselves: Popen.wait() would discard its rusage.
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    for reader in readers:
+        reader.join()
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    rss_kib = rusage.ru_maxrss / 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    usage = {
+        "peak_rss_mb": round(rss_kib / 1024, 1),
+        "cpu_seconds": round(rusage.ru_utime + rusage.ru_stime, 2),
+    }
+    completed = subprocess.CompletedProcess(cmd, proc.returncode, streams.get("stdout", ""), streams.get("stderr", ""))
+    return completed, usage
+
+
+def limit_hit(result: subprocess.CompletedProcess[str], limits: dict, usage: dict | None = None) -> str | None:
+    """Name the limit a governed tool ran into, if its exit shows one.
+
+    RLIMIT_CPU sends SIGXCPU and then SIGKILL, so a SIGKILL only counts as
+    the CPU cap when the measured CPU time reached it. RLIMIT_AS never
+    kills: allocations fail, so the tool either reports running out of
+    memory or aborts. Any other SIGKILL (e.g. the kernel OOM killer) is
+    not one of our limits.
+    """
+    if result.returncode == 0 or not limits:
+        return None
+    cpu_limit = limits.get("cpu_seconds")
+    if cpu_limit and (
+        result.returncode == -signal.SIGXCPU
+        or (result.returncode == -signal.SIGKILL and usage and usage["cpu_seconds"] >= cpu_limit)
+    ):
+        return f"cpu_seconds={cpu_limit}"
+    if limits.get("memory_mb") and (
+        _OOM_RE.search(result.stderr or "")
+        or result.returncode in (-signal.SIGABRT, -signal.SIGSEGV)
+    ):
+        return f"memory_mb={limits['memory_mb']}"
+    return None
+
+
 def run_tool(
     name: str,
     command: list[str],
     artifact: Path | None,
     required_binary: str,
+    limits: dict | None = None,
 ) -> CommandResult:
+    if artifact:
+        discard_artifact(artifact)  # a tool that writes nothing must not report stale output
     if not command_exists(required_binary):
         return CommandResult(
             name=name,
@@ -138,8 +663,10 @@ def run_tool(
             skipped_reason=f"missing dependency: {required_binary}",
         )
 
+    TOOLS.version(required_binary)
+    started = time.monotonic()
     try:
-        result = run(command, check=False)
+        result, usage = run_governed(command, limits)
     except OSError as exc:
         return CommandResult(
             name=name,
@@ -154,6 +681,15 @@ def run_tool(
 
     findings = count_artifact_findings(artifact) if artifact else None
     status = "ok" if result.returncode == 0 else "warning"
+    skipped_reason = None
+    hit = limit_hit(result, limits or {}, usage)
+    if hit:
+        # Report the cap, not a crash: the tool's results are incomplete
+        # because we stopped it, and the peak usage says by how much.
+        status = "resource_limited"
+        skipped_reason = f"hit {hit}"
+        if usage:
+            skipped_reason += f" (peak {usage['peak_rss_mb']} MB RSS, {usage['cpu_seconds']}s CPU)"
 
     return CommandResult(
         name=name,
@@ -164,39 +700,419 @@ def run_tool(
         findings=findings,
         stdout=result.stdout,
         stderr=result.stderr,
+        skipped_reason=skipped_reason,
+        duration_s=round(time.monotonic() - started, 3),
+        resource_usage=usage,
     )
 
 
+# File classification tables. `classify_files` buckets each changed file in
+# one pass: exact basename first, then extension, then (for extensionless
+# files only) the shebang interpreter. The directory prefix is matched on its
+# own, so a `.py` under `k8s/` reaches both the python and iac scanners.
+FILE_CATEGORIES = ("python", "go", "js", "iac", "deps")
+BASENAME_CATEGORIES = {
+    "Dockerfile": "iac",
+    "package.json": "deps",
+    "package-lock.json": "deps",
+    "requirements.txt": "deps",
+    "pyproject.toml": "deps",
+    "go.mod": "deps",
+    "Cargo.toml": "deps",
+}
+EXTENSION_CATEGORIES = {
+    ".py": "python",
+    ".go": "go",
+    ".js": "js",
+    ".jsx": "js",
+    ".mjs": "js",
+    ".cjs": "js",
+    ".ts": "js",
+    ".tsx": "js",
+    ".tf": "iac",
+}
+DIRECTORY_CATEGORIES = {"k8s/": "iac", "helm/": "iac"}
+SHEBANG_CATEGORIES = {"python": "python", "node": "js", "deno": "js", "bun": "js", "ts-node": "js"}
+
+
+def shebang_category(path: str) -> str | None:
+    """Classify an extensionless script by its `#!` interpreter, e.g.
+    `#!/usr/bin/env python3` or `#!/usr/bin/env -S node --flag`."""
+    try:
+        with (ROOT / path).open("rb") as fp:
+            head = fp.readline(256)
+    except OSError:
+        return None
+    if not head.startswith(b"#!"):
+        return None
+    tokens = head[2:].decode("utf-8", "replace").split()
+    if tokens and tokens[0].rsplit("/", 1)[-1] == "env":
+        tokens = [token for token in tokens[1:] if not token.startswith("-")]
+    if not tokens:
+        return None
+    interpreter = tokens[0].rsplit("/", 1)[-1]
+    for prefix, category in SHEBANG_CATEGORIES.items():
+        if interpreter.startswith(prefix):
+            return category
+    return None
+
+
+def _is_extensionless(file: str) -> bool:
+    stem, dot, _ = file.rpartition("/")[2].rpartition(".")
+    return not (dot and stem)
+
+
+def classify_files(files: Iterable[str], sniff_shebangs: bool = True) -> dict[str, list[str]]:
+    """Bucket changed files per scanner category in a single pass.
+
+    Returns `{category: [files]}` for every name in FILE_CATEGORIES,
+    preserving input order within each bucket. A file gets at most one
+    bucket from its name or content, plus the bucket of a matching
+    DIRECTORY_CATEGORIES prefix. Extensionless files fall back to shebang
+    sniffing unless `sniff_shebangs` is False (or the file no longer
+    exists on disk).
+    """
+    buckets: dict[str, list[str]] = {category: [] for category in FILE_CATEGORIES}
+    for file in files:
+        basename = file.rpartition("/")[2]
+        category = BASENAME_CATEGORIES.get(basename)
+        if category is None:
+            if not _is_extensionless(basename):
+                category = EXTENSION_CATEGORIES.get("." + basename.rpartition(".")[2])
+            elif sniff_shebangs:
+                category = shebang_category(file)
+        if category is not None:
+            buckets[category].append(file)
+        for prefix, prefix_category in DIRECTORY_CATEGORIES.items():
+            if file.startswith(prefix):
+                if prefix_category != category:
+                    buckets[prefix_category].append(file)
+                break
+    return buckets
+
+
 def detect_categories(files: Iterable[str]) -> dict[str, bool]:
-    files = list(files)
-    return {
-        "python": any(file.endswith(".py") for file in files),
-        "go": any(file.endswith(".go") for file in files),
-        "js": any(file.endswith((".js", ".jsx", ".ts", ".tsx")) for file in files),
-        "iac": any(
-            file == "Dockerfile"
-            or file.endswith(".tf")
-            or file.startswith("k8s/")
-            or file.startswith("helm/")
-            for file in files
-        ),
-        "deps": any(
-            Path(file).name in {
-                "package.json",
-                "package-lock.json",
-                "requirements.txt",
-                "pyproject.toml",
-                "go.mod",
-                "Cargo.toml",
-            }
-            for file in files
-        ),
-    }
+    return {category: bool(bucket) for category, bucket in classify_files(files).items()}
+
+
+def glob_to_regex(pattern: str) -> re.Pattern[str]:
+    """Compile a gitignore-flavored glob. `**` spans directories, `*` and
+    `?` stay within one path segment, and a pattern with no `/` matches the
+    basename at any depth."""
+    if "/" not in pattern:
+        pattern = "**/" + pattern
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def linguist_attributes(files: list[str], source: str | None = None) -> dict[str, str]:
+    """Return `{path: reason}` for files marked `linguist-generated` or
+    `linguist-vendored` in .gitattributes. Attributes are read from `source`
+    (the merge-base) when git supports `check-attr --source`, so a PR can't
+    hide its own files by editing .gitattributes; otherwise from the
+    working tree."""
+    if not files:
+        return {}
+    payload = "\0".join(files) + "\0"
+    attrs = ["linguist-generated", "linguist-vendored"]
+    base_cmd = ["git", "check-attr", "-z", "--stdin", *attrs]
+    attempts = [base_cmd[:2] + [f"--source={source}"] + base_cmd[2:]] if source else []
+    attempts.append(base_cmd)
+    for cmd in attempts:
+        try:
+            proc = subprocess.run(cmd, cwd=ROOT, input=payload, text=True, capture_output=True, check=False)
+        except OSError:
+            return {}
+        if proc.returncode == 0:
+            break
+    else:
+        return {}
+    marked: dict[str, str] = {}
+    fields = proc.stdout.split("\0")
+    for path, attr, value in zip(fields[0::3], fields[1::3], fields[2::3]):
+        if value not in ("unspecified", "unset", "false") and path not in marked:
+            marked[path] = attr
+    return marked
+
+
+def _average_line_length(path: Path, limit: int = 65536) -> float:
+    """Average line length over the first `limit` bytes of a file."""
+    with path.open("rb") as fp:
+        head = fp.read(limit)
+    if not head or b"\0" in head:
+        return 0.0  # empty or binary; leave it to the size check
+    return len(head) / (head.count(b"\n") + (not head.endswith(b"\n")))
+
+
+def prefilter_files(files: list[str], settings: dict, source: str | None = None) -> dict[str, str]:
+    """Pick out changed files the per-file scanners should skip.
+
+    Returns `{path: reason}`. Reasons, in the order they're checked:
+    `missing` (deleted in the diff), `glob:<pattern>`, `linguist-generated`
+    / `linguist-vendored`, `size>N`, and `minified` (a js/css/map file
+    whose average line is longer than `minified_avg_line_length`).
+    `settings` is the config's `prefilter` section.
+    """
+    if not settings.get("enabled", True):
+        return {}
+    globs = [(pattern, glob_to_regex(pattern)) for pattern in settings.get("exclude_globs", [])]
+    max_bytes = settings.get("max_file_bytes")
+    max_avg_line = settings.get("minified_avg_line_length")
+    minified_exts = tuple(settings.get("minified_extensions", ()))
+
+    excluded: dict[str, str] = {}
+    remaining: list[str] = []
+    for file in files:
+        path = ROOT / file
+        if not path.is_file():
+            excluded[file] = "missing"
+            continue
+        for pattern, regex in globs:
+            if regex.match(file):
+                excluded[file] = f"glob:{pattern}"
+                break
+        else:
+            remaining.append(file)
 
+    if settings.get("honor_gitattributes", True):
+        marked = linguist_attributes(remaining, source)
+        excluded.update(marked)
+        remaining = [file for file in remaining if file not in marked]
 
-def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep: bool) -> list[tuple[str, list[str], Path | None, str]]:
-    mb = merge_base(base)
-    categories = detect_categories(changed_files)
+    for file in remaining:
+        path = ROOT / file
+        try:
+            size = path.stat().st_size
+            if max_bytes and size > max_bytes:
+                excluded[file] = f"size>{max_bytes}"
+            elif (
+                max_avg_line
+                and file.endswith(minified_exts)
+                and _average_line_length(path) > max_avg_line
+            ):
+                excluded[file] = "minified"
+        except OSError:
+            excluded[file] = "missing"
+    return excluded
+
+
+def estimate_prefilter_savings(excluded: dict[str, str], results: list[CommandResult], plan_files: dict[str, list[str]]) -> float:
+    """Estimate scanner seconds saved by the prefilter.
+
+    Each per-file tool's measured duration is scaled by the bytes it would
+    additionally have read (excluded files in its bucket) over the bytes it
+    did read. Rough by design: scanners aren't linear in bytes, but it's
+    the right order of magnitude for reporting.
+    """
+
+    def total_bytes(files: Iterable[str]) -> int:
+        size = 0
+        for file in files:
+            try:
+                size += (ROOT / file).stat().st_size
+            except OSError:
+                pass
+        return size
+
+    saved = 0.0
+    for result in results:
+        candidates = plan_files.get(result.name)
+        if candidates is None or not result.duration_s:
+            continue
+        scanned = total_bytes(file for file in candidates if file not in excluded)
+        skipped = total_bytes(file for file in candidates if file in excluded)
+        if scanned:
+            saved += result.duration_s * skipped / scanned
+    return round(saved, 3)
+
+
+# Files a dependency scanner needs next to a changed manifest to resolve it.
+MANIFEST_SIBLINGS = {
+    "package.json", "package-lock.json", "yarn.lock", "pnpm-lock.yaml",
+    "requirements.txt", "pyproject.toml", "poetry.lock", "uv.lock", "Pipfile", "Pipfile.lock",
+    "go.mod", "go.sum",
+    "Cargo.toml", "Cargo.lock",
+    "Gemfile", "Gemfile.lock",
+    "composer.json", "composer.lock",
+}
+_TF_LOCAL_SOURCE_RE = re.compile(r'^\s*source\s*=\s*"(\.{1,2}/[^"]*)"', re.MULTILINE)
+
+
+def _within_root(path: Path) -> bool:
+    try:
+        path.resolve().relative_to(ROOT)
+    except ValueError:
+        return False
+    return True
+
+
+def sparse_workspace_files(buckets: dict[str, list[str]]) -> list[str]:
+    """Repo-relative files the repo-wide scanners need for this diff.
+
+    - changed dependency manifests plus their sibling manifests/lockfiles
+    - changed IaC files; a changed `.tf` pulls in its whole module
+      directory and, transitively, local `source = "./..."` modules
+    - a changed file inside a Helm chart pulls in the whole chart
+    """
+    wanted: set[Path] = set()
+    for file in buckets["deps"]:
+        directory = (ROOT / file).parent
+        if directory.is_dir():
+            wanted.update(p for p in directory.iterdir() if p.name in MANIFEST_SIBLINGS)
+
+    pending_modules: list[Path] = []
+    for file in buckets["iac"]:
+        path = ROOT / file
+        if not path.is_file():
+            continue
+        chart = next((parent for parent in path.parents if (parent / "Chart.yaml").is_file() and _within_root(parent)), None)
+        if chart is not None:
+            wanted.update(p for p in chart.rglob("*") if p.is_file())
+        elif path.suffix == ".tf":
+            pending_modules.append(path.parent)
+        else:
+            wanted.add(path)
+
+    seen_modules: set[Path] = set()
+    while pending_modules:
+        module = pending_modules.pop().resolve()
+        if module in seen_modules or not module.is_dir() or not _within_root(module):
+            continue
+        seen_modules.add(module)
+        for tf in module.iterdir():
+            if tf.suffix not in {".tf", ".tfvars"} or not tf.is_file():
+                continue
+            wanted.add(tf)
+            if tf.suffix == ".tf":
+                for source in _TF_LOCAL_SOURCE_RE.findall(tf.read_text(encoding="utf-8", errors="replace")):
+                    pending_modules.append(module / source)
+
+    return sorted(str(p.resolve().relative_to(ROOT)) for p in wanted if p.is_file() and _within_root(p))
+
+
+def build_sparse_workspace(files: list[str]) -> Path | None:
+    """Materialize `files` under a scratch directory that mirrors the repo
+    layout, so repo-wide scanners can be pointed at it instead of ROOT.
+
+    Lives on tmpfs (/dev/shm) when available. Files are hardlinked when the
+    scratch dir shares a filesystem with the repo and copied otherwise;
+    manifests and IaC are small either way. Returns None when there is
+    nothing to stage. The caller removes the directory once this returns;
+    a failed copy removes it here.
+    """
+    import tempfile
+
+    if not files:
+        return None
+    shm = Path("/dev/shm")
+    workspace = Path(tempfile.mkdtemp(prefix="security-audit-ws-", dir=shm if shm.is_dir() else None))
+    try:
+        for file in files:
+            dest = workspace / file
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(ROOT / file, dest)
+            except OSError:
+                shutil.copy2(ROOT / file, dest)
+    except BaseException:
+        shutil.rmtree(workspace, ignore_errors=True)
+        raise
+    return workspace
+
+
+def remap_sarif_paths(artifact: Path, workspace: Path) -> None:
+    """Rewrite artifact URIs in a SARIF file from sparse-workspace paths
+    back to repo-relative paths."""
+    payload = load_json(artifact)
+    if not isinstance(payload, dict):
+        return
+    prefixes = {str(workspace) + "/", str(workspace.resolve()) + "/"}
+
+    def fix(node: object) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "uri" and isinstance(value, str):
+                    bare = value[len("file://"):] if value.startswith("file://") else value
+                    for prefix in prefixes:
+                        if bare.startswith(prefix):
+                            node[key] = bare[len(prefix):]
+                            break
+                else:
+                    fix(value)
+        elif isinstance(node, list):
+            for item in node:
+                fix(item)
+
+    fix(payload)
+    write_text(artifact, json.dumps(payload) + "\n")
+
+
+def remap_artifact_paths(artifact: Path, workspace: Path) -> None:
+    """Map sparse-workspace paths in any artifact back to repo paths: SARIF
+    URIs structurally, other formats (trufflehog JSON lines) textually."""
+    if artifact.suffix == ".sarif":
+        remap_sarif_paths(artifact, workspace)
+        return
+    text = artifact.read_text(encoding="utf-8", errors="replace")
+    for prefix in {str(workspace) + "/", str(workspace.resolve()) + "/"}:
+        text = text.replace(prefix, "")
+    write_text(artifact, text)
+
+
+def per_file_targets(changed_files: list[str], buckets: dict[str, list[str]], excluded: dict[str, str] | None = None) -> dict[str, list[str]]:
+    """File lists for the tools that take explicit paths, keyed by plan
+    name, with prefiltered files removed."""
+    excluded = excluded or {}
+    targets = {
+        "semgrep": changed_files,
+        "lizard": changed_files,
+        "bandit": buckets["python"],
+        "eslint-security": buckets["js"],
+    }
+    return {name: [file for file in files if file not in excluded] for name, files in targets.items()}
+
+
+def build_tool_plan(
+    base: str | None,
+    changed_files: list[str],
+    output_dir: Path,
+    deep: bool,
+    excluded: dict[str, str] | None = None,
+    workspace: Path | None = None,
+    sparse: bool = False,
+) -> list[tuple[str, list[str], Path | None, str]]:
+    """Return `(name, command, artifact, required_binary)` entries to run.
+
+    With `sparse`, osv-scanner and trivy scan the sparse `workspace` (see
+    `build_sparse_workspace`) instead of the whole checkout, and each is
+    left out when nothing for it was staged: osv-scanner when the diff
+    touched no manifests, both when there is no workspace at all.
+
+    With `base=None` (an explicit `--paths-from` list, no git range) the
+    history-dependent tools degrade: semgrep scans the listed files without
+    `--baseline-commit`, and gitleaks/trufflehog scan the workspace as a
+    plain directory instead of walking commits.
+    """
+    mb = merge_base(base) if base else None
+    buckets = classify_files(changed_files)
+    targets = per_file_targets(changed_files, buckets, excluded)
     plan: list[tuple[str, list[str], Path | None, str]] = []
 
     semgrep_out = output_dir / "semgrep.sarif"
@@ -204,87 +1120,81 @@ def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep:
     # metrics enabled. Use `--config=p/default` (the curated registry
     # pack) with metrics off — works locally and in CI without any
     # account or telemetry. The MCP path (--use-mcp) bypasses this.
-    plan.append(
-        (
-            "semgrep",
-            [
+    semgrep_scope = [f"--baseline-commit={mb}"] if mb else targets["semgrep"]
+    if semgrep_scope:
+        plan.append(
+            (
                 "semgrep",
-                "scan",
-                "--config=p/default",
-                f"--baseline-commit={mb}",
-                "--sarif",
-                f"--sarif-output={semgrep_out}",
-                "--metrics=off",
-                "--quiet",
-            ],
-            semgrep_out,
-            "semgrep",
+                [
+                    "semgrep",
+                    "scan",
+                    "--config=p/default",
+                    "--sarif",
+                    f"--sarif-output={semgrep_out}",
+                    "--metrics=off",
+                    "--quiet",
+                    *semgrep_scope,
+                ],
+                semgrep_out,
+                "semgrep",
+            )
         )
-    )
 
     gitleaks_out = output_dir / "gitleaks.sarif"
-    # Resolve symbolic refs (origin/HEAD) to a concrete SHA before passing to
-    # --log-opts; some gitleaks versions choke on two-dot ranges with symbolic
-    # refs.
-    plan.append(
-        (
-            "gitleaks",
-            [
-                "gitleaks",
-                "git",
-                "--report-format",
-                "sarif",
-                "--report-path",
-                str(gitleaks_out),
-                f"--log-opts={mb}..HEAD",
-                "--no-banner",
-            ],
-            gitleaks_out,
-            "gitleaks",
-        )
-    )
-
+    gitleaks_report = ["--report-format", "sarif", "--report-path", str(gitleaks_out), "--no-banner"]
+    if mb:
+        # Resolve symbolic refs (origin/HEAD) to a concrete SHA before passing
+        # to --log-opts; some gitleaks versions choke on two-dot ranges with
+        # symbolic refs.
+        plan.append(("gitleaks", ["gitleaks", "git", *gitleaks_report, f"--log-opts={mb}..HEAD"], gitleaks_out, "gitleaks"))
+    elif workspace:
+        plan.append(("gitleaks", ["gitleaks", "dir", *gitleaks_report, str(workspace)], gitleaks_out, "gitleaks"))
+
+    # Sparse mode never falls back to the checkout: with nothing staged
+    # there is nothing in this diff for the repo-wide scanners to look at.
+    repo_scope = str(workspace) if sparse else "."
     osv_out = output_dir / "osv.sarif"
-    plan.append(
-        (
-            "osv-scanner",
-            [
+    if not sparse or (workspace and buckets["deps"]):
+        plan.append(
+            (
                 "osv-scanner",
-                "scan",
-                "source",
-                "--format=sarif",
-                f"--output={osv_out}",
-                "--recursive",
-                ".",
-            ],
-            osv_out,
-            "osv-scanner",
+                [
+                    "osv-scanner",
+                    "scan",
+                    "source",
+                    "--format=sarif",
+                    f"--output={osv_out}",
+                    "--recursive",
+                    repo_scope,
+                ],
+                osv_out,
+                "osv-scanner",
+            )
         )
-    )
 
-    if changed_files:
+    if targets["lizard"]:
         lizard_out = output_dir / "lizard.xml"
         plan.append(
             (
                 "lizard",
-                ["lizard", "-X", *changed_files],
+                ["lizard", "-X", *targets["lizard"]],
                 lizard_out,
                 "lizard",
             )
         )
 
-    if categories["iac"]:
+    if buckets["iac"] and (not sparse or workspace):
         trivy_out = output_dir / "trivy-config.sarif"
         plan.append(
             (
                 "trivy",
-                ["trivy", "config", "--format=sarif", f"-o={trivy_out}", "."],
+                ["trivy", "config", "--format=sarif", f"-o={trivy_out}", repo_scope],
                 trivy_out,
                 "trivy",
             )
         )
 
-    if categories["deps"]:
+    if buckets["deps"]:
         socket_out = output_dir / "socket.json"
         plan.append(
             (
@@ -295,8 +1205,8 @@ def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep:
             )
         )
 
-    if categories["python"]:
-        python_files = [file for file in changed_files if file.endswith(".py")]
+    if targets["bandit"]:
+        python_files = targets["bandit"]
         bandit_out = output_dir / "bandit.sarif"
         plan.append(
             (
@@ -307,7 +1217,7 @@ def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep:
             )
         )
 
-    if categories["go"]:
+    if buckets["go"]:
         govuln_out = output_dir / "govulncheck.sarif"
         plan.append(
             (
@@ -318,8 +1228,8 @@ def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep:
             )
         )
 
-    if categories["js"]:
-        js_files = [file for file in changed_files if file.endswith((".js", ".jsx", ".ts", ".tsx"))]
+    if targets["eslint-security"]:
+        js_files = targets["eslint-security"]
         eslint_out = output_dir / "eslint-security.sarif"
 
         # ESLint flat config resolves imported plugins relative to the config
@@ -348,6 +1258,10 @@ def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep:
             ),
             encoding="utf-8",
         )
+        # Flat config only lints files matched by some `files` pattern, and
+        # the defaults are by extension. Shebang-sniffed scripts without one
+        # are listed explicitly so eslint doesn't drop them as ignored.
+        extensionless = [file for file in js_files if _is_extensionless(file)]
         (eslint_dir / "config.mjs").write_text(
             "import security from 'eslint-plugin-security';\n"
             "export default [{\n"
@@ -358,7 +1272,9 @@ def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep:
             "    'security/detect-child-process': 'error',\n"
             "    'security/detect-unsafe-regex': 'warn',\n"
             "  },\n"
-            "}];\n",
+            "}"
+            + (f", {{ files: {json.dumps(extensionless)} }}" if extensionless else "")
+            + "];\n",
             encoding="utf-8",
         )
         # First-run install. After this lands the node_modules dir is cached
@@ -405,12 +1321,13 @@ def build_tool_plan(base: str, changed_files: list[str], output_dir: Path, deep:
             )
         )
 
-    if deep:
+    if deep and (mb or workspace):
         trufflehog_out = output_dir / "trufflehog.json"
+        source = ["git", "file://."] if mb else ["filesystem", str(workspace)]
         plan.append(
             (
                 "trufflehog",
-                ["trufflehog", "git", "file://.", "--only-verified", "--json"],
+                ["trufflehog", *source, "--only-verified", "--json"],
                 trufflehog_out,
                 "trufflehog",
             )
@@ -426,7 +1343,13 @@ def persist_artifact_output(result: CommandResult, plan_artifact: Path | None) -
         write_text(plan_artifact, result.stdout)
 
 
-def make_summary(base: str, changed_files: list[str], results: list[CommandResult]) -> dict:
+def make_summary(
+    base: str,
+    changed_files: list[str],
+    results: list[CommandResult],
+    excluded: dict[str, str] | None = None,
+    prefilter_saved_s: float | None = None,
+) -> dict:
     total_findings = 0
     findings_known = 0
     for result in results:
@@ -448,9 +1371,21 @@ def make_summary(base: str, changed_files: list[str], results: list[CommandResul
                 "artifact": result.artifact,
                 "command": result.command,
                 "skipped_reason": result.skipped_reason,
+                "duration_s": result.duration_s,
+                "resource_usage": result.resource_usage,
+                **({"shards": result.shards} if result.shards else {}),
             }
             for result in results
         ],
+        "excluded_files": [{"path": path, "reason": reason} for path, reason in (excluded or {}).items()],
+        "prefilter": {
+            "excluded_count": len(excluded or {}),
+            "estimated_time_saved_s": prefilter_saved_s,
+            # Content heuristics the diff's author controls, listed apart
+            # so a reviewer can check them by hand.
+            "minified": sorted(path for path, reason in (excluded or {}).items() if reason == "minified"),
+        },
+        "tool_versions": TOOLS.snapshot(),
     }
 
 
@@ -472,17 +1407,196 @@ def summary_markdown(summary: dict) -> str:
         if tool["skipped_reason"]:
             status = f"{status} ({tool['skipped_reason']})"
         lines.append(f"| {tool['name']} | {status} | {findings} | `{artifact}` |")
+    if summary.get("excluded_files"):
+        saved = summary["prefilter"]["estimated_time_saved_s"]
+        lines.extend(["", "## Skipped by prefilter", ""])
+        if saved:
+            lines.append(f"Per-file scanners skipped these files (estimated `{saved}s` saved).")
+            lines.append("")
+        lines.extend([f"- `{item['path']}` ({item['reason']})" for item in summary["excluded_files"]])
+        if summary["prefilter"].get("minified"):
+            lines.extend([
+                "",
+                f"{len(summary['prefilter']['minified'])} file(s) were skipped as minified from their content alone. "
+                "The diff controls that heuristic, so review them by hand.",
+            ])
     if summary["changed_files"]:
         lines.extend(["", "## Changed Files", ""])
         lines.extend([f"- `{path}`" for path in summary["changed_files"]])
     return "\n".join(lines) + "\n"
 
 
-def _try_mcp_scan(args: argparse.Namespace, changed_files: list[str], output_dir: Path) -> dict | None:
+# Every scanner a plan can run.
+SCANNER_BINARIES = (
+    "semgrep", "gitleaks", "osv-scanner", "lizard", "trivy",
+    "socket", "bandit", "govulncheck", "trufflehog", "uvx", "semgrep-mcp",
+)
+
+
+def plan_binaries(changed_files: list[str], args: argparse.Namespace) -> list[str]:
+    """The SCANNER_BINARIES a `scan` of `changed_files` with these flags may
+    run, without building the plan (which sets up the eslint runner).
+    Mirrors the conditions in `build_tool_plan`, erring towards including
+    a tool, so the pass cache only probes versions that can matter."""
+    buckets = classify_files(changed_files)
+    wanted = {"semgrep", "gitleaks", "lizard"}
+    if buckets["deps"] or args.deep or args.no_sparse:
+        wanted.add("osv-scanner")
+    if buckets["iac"]:
+        wanted.add("trivy")
+    if buckets["deps"]:
+        wanted.add("socket")
+    if buckets["python"]:
+        wanted.add("bandit")
+    if buckets["go"]:
+        wanted.add("govulncheck")
+    if args.deep:
+        wanted.add("trufflehog")
+    if args.use_mcp:
+        wanted.update({"uvx", "semgrep-mcp"})
+    return [name for name in SCANNER_BINARIES if name in wanted]
+
+
+PASS_CACHE_LIMIT = 64
+
+
+def pass_cache_key(base: str, args: argparse.Namespace, config: dict, changed_files: list[str]) -> str | None:
+    """Key a clean verdict on everything that decides it: the HEAD tree,
+    the merge-base, the scan flags, the effective config and the version
+    of every scanner this pass may run (see `plan_binaries`). Returns None
+    when the working tree differs from HEAD, since the scanners read the
+    working tree and a HEAD-keyed verdict would lie. Untracked files don't
+    count: the scanners audit the diff against the base, and the runner's
+    own `.artifacts/` output would otherwise make every tree dirty after
+    the first scan."""
+    import hashlib
+
+    if run(["git", "status", "--porcelain", "-z", "--untracked-files=no"], check=False).stdout:
+        return None
+    tree = run(["git", "rev-parse", "HEAD^{tree}"], check=False).stdout.strip()
+    if not tree:
+        return None
+    payload = {
+        "tree": tree,
+        "merge_base": merge_base(base),
+        "deep": args.deep,
+        "use_mcp": args.use_mcp,
+        "no_prefilter": args.no_prefilter,
+        "no_sparse": args.no_sparse,
+        "exclude_glob": args.exclude_glob or [],
+        "config": config,
+        "tools": {name: TOOLS.version(name) for name in plan_binaries(changed_files, args)},
+        "runner": hashlib.sha256(Path(__file__).read_bytes()).hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def load_pass_cache(output_dir: Path) -> dict[str, dict]:
+    payload = load_json(output_dir / "pass-cache.json")
+    return payload if isinstance(payload, dict) else {}
+
+
+def record_pass(output_dir: Path, key: str, base: str, summary: dict) -> None:
+    """Remember a clean verdict, keeping the newest PASS_CACHE_LIMIT."""
+    cache = load_pass_cache(output_dir)
+    cache[key] = {
+        "base": base,
+        "head": run(["git", "rev-parse", "HEAD"], check=False).stdout.strip(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "changed_file_count": summary["changed_file_count"],
+    }
+    newest = sorted(cache.items(), key=lambda item: item[1].get("recorded_at", ""))[-PASS_CACHE_LIMIT:]
+    path = output_dir / "pass-cache.json"
+    partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    partial.write_text(json.dumps(dict(newest), indent=2) + "\n", encoding="utf-8")
+    os.replace(partial, path)
+
+
+# Default MCP pool size: each server is a full semgrep process, so the pool
+# grows with the diff (one server per MCP_SHARD_MIN_FILES files) up to
+# MCP_MAX_SHARDS, never past the CPU count.
+MCP_MAX_SHARDS = 4
+MCP_SHARD_MIN_FILES = 25
+
+
+def default_mcp_shards(file_count: int) -> int:
+    by_files = -(-file_count // MCP_SHARD_MIN_FILES)
+    return max(1, min(MCP_MAX_SHARDS, os.cpu_count() or 1, by_files))
+
+
+def shard_files(files: list[str], count: int) -> list[list[str]]:
+    """Split `files` into at most `count` shards of similar total size
+    (largest-first greedy), so no one shard is the long pole."""
+    def size(path: str) -> int:
+        try:
+            return (ROOT / path).stat().st_size
+        except OSError:
+            return 0
+
+    shards: list[tuple[int, list[str]]] = [(0, []) for _ in range(max(1, min(count, len(files))))]
+    for path in sorted(files, key=size, reverse=True):
+        total, members = min(shards, key=lambda shard: shard[0])
+        shards.remove((total, members))
+        members.append(path)
+        shards.append((total + size(path), members))
+    return [sorted(members) for _, members in shards if members]
+
+
+def merge_sarif(parts: list[Path], target: Path) -> None:
+    """Merge SARIF files that each hold one semgrep run into a single run:
+    results concatenated, rules de-duplicated by id."""
+    merged: dict | None = None
+    rules: dict[str, dict] = {}
+    results: list = []
+    for part in parts:
+        payload = load_json(part)
+        if not isinstance(payload, dict):
+            continue
+        for run_item in payload.get("runs", []):
+            if merged is None:
+                merged = {**payload, "runs": [run_item]}
+            driver = (run_item.get("tool") or {}).get("driver") or {}
+            for rule in driver.get("rules") or []:
+                rules.setdefault(rule.get("id"), rule)
+            results.extend(run_item.get("results") or [])
+    if merged is None:
+        merged = {"version": "2.1.0", "runs": [{"tool": {"driver": {"name": "semgrep"}}}]}
+    run_item = merged["runs"][0]
+    run_item.setdefault("tool", {}).setdefault("driver", {})["rules"] = list(rules.values())
+    run_item["results"] = results
+    write_text(target, json.dumps(merged) + "\n")
+
+
+def _try_mcp_scan(
+    args: argparse.Namespace,
+    changed_files: list[str],
+    output_dir: Path,
+    excluded: dict[str, str] | None = None,
+    on_progress: Callable[[dict], None] | None = None,
+) -> dict | None:
     """Attempt to run the Semgrep portion of the audit via MCP.
 
     Returns a CommandResult-like dict for the semgrep tool on success, or
     None if MCP is unavailable / failed (caller falls back to subprocess).
+    A server whose cached `tools/list` lacks `semgrep_scan` or one of the
+    arguments used below counts as unavailable, without being started.
+
+    When the server's `semgrep_scan` schema declares a `targets` list (the
+    published semgrep-mcp tool does not; `scripts/mcp_stub.py` does), the
+    changed files are split into `--mcp-shards` shards (default: see
+    `default_mcp_shards`) and scanned concurrently on that many MCP servers, one
+    `semgrep_scan` per shard; the shard SARIFs are merged into
+    `semgrep.sarif` and each shard's timing is reported. Otherwise one
+    `path` + `baseline_commit` call covers the diff, and without a baseline
+    to scope it (`--paths-from`) such a server counts as unavailable. Any
+    shard failing fails the whole MCP attempt so results are never partial.
+    A server that crashes mid-scan is respawned (twice at most) and its
+    shard resent. With no files left to scan after the prefilter nothing is
+    started.
+
+    `on_progress`, if given, receives one event per progress notification
+    the server sends for a shard (`shard`, `progress`, `total`, `message`,
+    and the shard's rate so far), so a slow scan visibly advances.
 
     Only handles the Semgrep call; gitleaks/osv-scanner/etc. remain on the
     subprocess path. See `references/mcp-integration.md` for the migration
@@ -494,24 +1608,93 @@ def _try_mcp_scan(args: argparse.Namespace, changed_files: list[str], output_dir
         from mcp_client import SemgrepMCPClient, is_available, SemgrepMCPError
     except ImportError:
         return None
-    if not is_available():
+    files = [f for f in per_file_targets(changed_files, classify_files(changed_files), excluded)["semgrep"] if (ROOT / f).is_file()]
+    if not files:
+        return None
+    baseline = None if getattr(args, "paths_from", None) else merge_base(args.base)
+    # Every argument semgrep_scan will be sent must be in its schema. With
+    # a baseline, `targets` is optional (only some servers take it); an
+    # explicit path list can't be scoped without it.
+    required = {"semgrep_scan": ["path", "config", "sarif_output", *(["baseline_commit"] if baseline else ["targets"])]}
+    if not is_available(required=required):
         return None
 
+    from concurrent.futures import ThreadPoolExecutor
+    from mcp_client import check_tools
+
     semgrep_out = output_dir / "semgrep.sarif"
+    discard_artifact(semgrep_out)
+    shard_dir = output_dir / "semgrep-shards"
+    timings: list[dict] = []
+    clients: list = []
     try:
-        with SemgrepMCPClient.spawn() as client:
-            mb = merge_base(args.base)
+        # One server first to confirm (via its cached or fresh tools/list)
+        # that it can do the scan, then the rest in parallel; with a broker
+        # running (and opted into) each spawn is just an attach.
+        clients.append(SemgrepMCPClient.spawn(respawn=True, max_respawns=2))
+        clients[0].require(required)
+        use_targets = not check_tools(clients[0].list_tools(), {"semgrep_scan": [*required["semgrep_scan"], "targets"]})
+        if use_targets:
+            shards = shard_files(files, getattr(args, "mcp_shards", 0) or default_mcp_shards(len(files)))
+        else:
+            shards = [files]  # one whole-tree call, scoped to the diff by baseline_commit
+        with ThreadPoolExecutor(max_workers=len(shards) or 1) as pool:
+            spawned = [pool.submit(SemgrepMCPClient.spawn, respawn=True, max_respawns=2) for _ in shards[1:]]
+            errors = []
+            for future in spawned:
+                try:
+                    clients.append(future.result())
+                except SemgrepMCPError as exc:
+                    errors.append(exc)
+            if errors:
+                raise errors[0]
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        calls = []
+        for index, (client, shard) in enumerate(zip(clients, shards)):
+            part = shard_dir / f"shard-{index}.sarif"
             # The semgrep_scan tool takes path + config. We use --config=auto
             # for parity with the recommended subprocess invocation.
-            result = client.call(
-                "semgrep_scan",
-                {
-                    "path": str(ROOT),
-                    "config": "auto",
-                    "baseline_commit": mb,
-                    "sarif_output": str(semgrep_out),
-                },
-            )
+            arguments = {"path": str(ROOT), "config": "auto", "sarif_output": str(part)}
+            if use_targets:
+                arguments["targets"] = shard
+            if baseline:
+                arguments["baseline_commit"] = baseline
+            started = time.monotonic()
+            progress = None
+            if on_progress is not None:
+
+                def progress(done: float, total: float | None, message: str | None, index: int = index, started: float = started) -> None:
+                    elapsed = time.monotonic() - started
+                    on_progress({
+                        "tool": "semgrep",
+                        "shard": index,
+                        "progress": done,
+                        "total": total,
+                        "message": message,
+                        "elapsed_s": round(elapsed, 3),
+                        "rate_per_s": round(done / elapsed, 2) if elapsed > 0 else None,
+                    })
+
+            calls.append((index, shard, part, started, client.call_async("semgrep_scan", arguments, progress=progress)))
+        failures = []
+        for index, shard, part, started, future in calls:
+            try:
+                future.result()
+                status, error = "ok", None
+            except SemgrepMCPError as exc:
+                status, error = "error", str(exc)
+                failures.append(f"shard {index}: {exc}")
+            timings.append({
+                "shard": index,
+                "files": len(shard),
+                "duration_s": round(time.monotonic() - started, 3),
+                "status": status,
+                "error": error,
+                "respawns": clients[index].metrics["respawns"],
+            })
+        if failures:
+            raise SemgrepMCPError("; ".join(failures))
+        merge_sarif([part for _, _, part, _, _ in calls], semgrep_out)
         return {
             "name": "semgrep (via MCP)",
             "status": "ok",
@@ -519,7 +1702,8 @@ def _try_mcp_scan(args: argparse.Namespace, changed_files: list[str], output_dir
             "findings": count_artifact_findings(semgrep_out),
             "artifact": str(semgrep_out),
             "skipped_reason": None,
-            "command": ["mcp:semgrep_scan", "--config=auto"],
+            "command": ["mcp:semgrep_scan", "--config=auto", f"--shards={len(shards)}"],
+            "shards": timings,
         }
     except SemgrepMCPError as exc:
         # MCP path failed; let the caller fall through to subprocess.
@@ -531,36 +1715,465 @@ def _try_mcp_scan(args: argparse.Namespace, changed_files: list[str], output_dir
             "artifact": None,
             "skipped_reason": f"MCP error, falling back to subprocess: {exc}",
             "command": ["mcp:semgrep_scan"],
+            "shards": timings or None,
+        }
+    finally:
+        for client in clients:
+            client.close()
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+# Per-file scanners used by `scan --per-commit`. Each entry is the command
+# prefix (targets are appended), the category bucket it applies to (None =
+# every file), and the parser that turns its JSON stdout into findings.
+PER_COMMIT_TOOLS: dict[str, tuple[list[str], str | None, str]] = {
+    "semgrep": (["semgrep", "scan", "--config=p/default", "--json", "--metrics=off", "--quiet", "--no-git-ignore"], None, "semgrep"),
+    "bandit": (["bandit", "-f", "json", "-q"], "python", "bandit"),
+}
+NULL_SHA = "0" * 40
+
+
+def parse_finding_json(kind: str, stdout: str) -> list[dict]:
+    """Normalize semgrep/bandit JSON output to `{path, line, rule, message}`."""
+    try:
+        payload = json.loads(stdout or "{}")
+    except json.JSONDecodeError:
+        return []
+    findings = []
+    for item in payload.get("results", []) if isinstance(payload, dict) else []:
+        if kind == "semgrep":
+            findings.append({
+                "path": item.get("path"),
+                "line": (item.get("start") or {}).get("line"),
+                "rule": item.get("check_id"),
+                "message": (item.get("extra") or {}).get("message", ""),
+            })
+        else:
+            findings.append({
+                "path": item.get("filename"),
+                "line": item.get("line_number"),
+                "rule": item.get("test_id"),
+                "message": item.get("issue_text", ""),
+            })
+    return findings
+
+
+def commit_range(base: str) -> list[str]:
+    """Commits between the merge-base and HEAD, oldest first."""
+    mb = merge_base(base)
+    result = run(["git", "rev-list", "--reverse", "--topo-order", f"{mb}..HEAD"], check=False)
+    return [line for line in result.stdout.split() if line]
+
+
+def commit_file_changes(sha: str) -> list[tuple[str, str, str]]:
+    """`(path, old_blob, new_blob)` for every file a commit touched relative
+    to its first parent. Added files have a null old blob; deleted files a
+    null new blob."""
+    result = run(["git", "diff-tree", "-r", "-z", "--no-commit-id", "--raw", f"{sha}^", sha], check=False)
+    fields = result.stdout.split("\0")
+    changes = []
+    for meta, path in zip(fields[0::2], fields[1::2]):
+        parts = meta.split()
+        if len(parts) >= 5 and parts[0].startswith(":"):
+            changes.append((path, parts[2], parts[3]))
+    return changes
+
+
+def read_blobs(shas: Iterable[str]) -> dict[str, bytes]:
+    """Fetch blob contents in one `git cat-file --batch` round-trip."""
+    wanted = sorted(set(shas) - {NULL_SHA})
+    if not wanted:
+        return {}
+    proc = subprocess.run(
+        ["git", "cat-file", "--batch"],
+        cwd=ROOT,
+        input=("\n".join(wanted) + "\n").encode(),
+        capture_output=True,
+        check=False,
+    )
+    out = proc.stdout
+    blobs: dict[str, bytes] = {}
+    pos = 0
+    for sha in wanted:
+        header_end = out.index(b"\n", pos)
+        header = out[pos:header_end].split()
+        pos = header_end + 1
+        if len(header) < 3 or header[1] != b"blob":
+            continue  # "<sha> missing"
+        size = int(header[2])
+        blobs[sha] = out[pos:pos + size]
+        pos += size + 1
+    return blobs
+
+
+class BlobResultCache:
+    """Per-tool scanner results keyed by `(path, blob sha)`.
+
+    A file whose blob didn't change between commits (or between runs) is
+    never rescanned. Entries persist as one JSON file per key under
+    `<output_dir>/blob-cache/<tool>/`. The key includes the tool's command
+    and its registry-recorded version, so a config change or a scanner
+    upgrade invalidates it.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, tool: str, command: list[str], path: str, blob: str) -> Path:
+        import hashlib
+
+        version = TOOLS.version(command[0])
+        key = hashlib.sha256(json.dumps([command, version, path, blob]).encode()).hexdigest()
+        return self.directory / tool / key[:2] / f"{key}.json"
+
+    def get(self, tool: str, command: list[str], path: str, blob: str) -> list[dict] | None:
+        entry = self._path(tool, command, path, blob)
+        cached = load_json(entry)
+        if isinstance(cached, list):
+            self.hits += 1
+            os.utime(entry)  # LRU recency for `gc`
+            return cached
+        self.misses += 1
+        return None
+
+    def put(self, tool: str, command: list[str], path: str, blob: str, findings: list[dict]) -> None:
+        write_text(self._path(tool, command, path, blob), json.dumps(findings))
+
+
+# Bytes of target paths per scanner invocation. Linux allows ~2 MiB of argv
+# plus environment; staying far below it avoids E2BIG on long stacks.
+ARGV_BUDGET = 128 * 1024
+
+
+def argv_batches(args: list[str], budget: int = ARGV_BUDGET) -> Iterator[list[str]]:
+    """Split `args` into consecutive batches whose total length (counting
+    each argument's NUL terminator) stays within `budget` bytes."""
+    batch: list[str] = []
+    size = 0
+    for arg in args:
+        cost = len(os.fsencode(arg)) + 1
+        if batch and size + cost > budget:
+            yield batch
+            batch, size = [], 0
+        batch.append(arg)
+        size += cost
+    if batch:
+        yield batch
+
+
+def scan_blobs(
+    tool: str,
+    command: list[str],
+    kind: str,
+    items: list[tuple[str, str]],
+    blobs: dict[str, bytes],
+    limits: dict | None = None,
+) -> tuple[dict[tuple[str, str], list[dict]], str | None]:
+    """Run one scanner over a batch of `(path, blob)` pairs. Each blob is
+    written to `<scratch>/<blob>/<path>` so the scanner sees the real file
+    name, and results are mapped back per pair. Targets go in as few
+    governed invocations as fit in ARGV_BUDGET.
+
+    Returns `(results, error)`. Pairs from an invocation that failed or hit
+    a resource limit are left out of `results`, so they are never cached as
+    clean, and `error` says why.
+    """
+    import tempfile
+
+    results: dict[tuple[str, str], list[dict]] = {}
+    error = None
+    if not items:
+        return results, error
+    with tempfile.TemporaryDirectory(prefix="security-audit-blobs-") as scratch:
+        targets: dict[str, tuple[str, str]] = {}
+        for path, blob in items:
+            dest = Path(scratch) / blob / path
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            dest.write_bytes(blobs.get(blob, b""))
+            targets[str(dest)] = (path, blob)
+        for batch in argv_batches(list(targets)):
+            try:
+                proc, usage = run_governed([*command, *batch], limits, cwd=Path(scratch))
+            except OSError as exc:
+                error = str(exc)
+                continue
+            hit = limit_hit(proc, limits or {}, usage)
+            if hit or proc.returncode not in (0, 1):
+                error = f"hit {hit}" if hit else f"exit {proc.returncode}: {proc.stderr.strip()[:200]}"
+                continue
+            batch_results = {targets[target]: [] for target in batch}
+            for finding in parse_finding_json(kind, proc.stdout):
+                raw = finding.get("path") or ""
+                key = targets.get(raw) or targets.get(str((Path(scratch) / raw).resolve()))
+                if key not in batch_results:
+                    continue
+                finding["path"] = key[0]
+                batch_results[key].append(finding)
+            results.update(batch_results)
+    return results, error
+
+
+def _finding_fingerprint(finding: dict, tool: str, content: bytes) -> tuple[str, str, str, str]:
+    """Line-number-free identity of a finding, so code moving within a file
+    doesn't look like a new finding: tool, rule, path, and the flagged
+    line's text."""
+    lines = content.decode("utf-8", "replace").splitlines()
+    line = finding.get("line") or 0
+    text = lines[line - 1].strip() if 0 < line <= len(lines) else ""
+    return (tool, str(finding.get("rule")), str(finding.get("path")), text)
+
+
+def per_commit_audit(base: str, output_dir: Path, exclude_globs: list[str], config: dict | None = None) -> dict:
+    """Attribute per-file scanner findings to the commit that introduced them.
+
+    For each commit in merge-base..HEAD, scan the before and after blob of
+    every touched file and report findings present after but not before.
+    Results are cached by blob (see BlobResultCache), so a blob is scanned
+    at most once per tool across the whole stack and across runs; total
+    work is proportional to the sum of the per-commit diffs. Scanners run
+    under the config's `limits`, like the main scan.
+    """
+    from collections import Counter
+
+    globs = [glob_to_regex(pattern) for pattern in exclude_globs]
+    commits = commit_range(base)
+    touched: list[tuple[str, list[tuple[str, str, str]]]] = []
+    for sha in commits:
+        changes = [
+            change for change in commit_file_changes(sha)
+            if not any(regex.match(change[0]) for regex in globs)
+        ]
+        touched.append((sha, changes))
+
+    all_blobs = {blob for _, changes in touched for _, old, new in changes for blob in (old, new)}
+    blobs = read_blobs(all_blobs)
+    cache = BlobResultCache(output_dir / "blob-cache")
+
+    # Resolve every (tool, path, blob) from the cache, then scan all the
+    # misses for each tool in as few invocations as the argv allows.
+    findings: dict[tuple[str, str, str], list[dict]] = {}
+    skipped_tools: dict[str, str] = {}
+    for tool, (command, category, kind) in PER_COMMIT_TOOLS.items():
+        if not command_exists(command[0]):
+            skipped_tools[tool] = f"missing dependency: {command[0]}"
+            continue
+        pairs = {
+            (path, blob)
+            for _, changes in touched
+            for path, old, new in changes
+            for blob in (old, new)
+            if blob != NULL_SHA
         }
+        if category is not None:
+            in_bucket = set(classify_files(sorted({path for path, _ in pairs}), sniff_shebangs=False)[category])
+            pairs = {pair for pair in pairs if pair[0] in in_bucket}
+        misses = []
+        for path, blob in sorted(pairs):
+            cached = cache.get(tool, command, path, blob)
+            if cached is None:
+                misses.append((path, blob))
+            else:
+                findings[(tool, path, blob)] = cached
+        scanned, error = scan_blobs(tool, command, kind, misses, blobs, tool_limits(config or {}, tool))
+        for (path, blob), found in scanned.items():
+            cache.put(tool, command, path, blob, found)
+            findings[(tool, path, blob)] = found
+        if error:
+            skipped_tools[tool] = f"{len(misses) - len(scanned)} blob(s) not scanned: {error}"
+
+    report_commits = []
+    total = 0
+    for sha, changes in touched:
+        subject = run(["git", "log", "-1", "--format=%s", sha], check=False).stdout.strip()
+        introduced: list[dict] = []
+        resolved = 0
+        for path, old, new in changes:
+            for tool in PER_COMMIT_TOOLS:
+                before = findings.get((tool, path, old), [])
+                after = findings.get((tool, path, new), [])
+                remaining = Counter(_finding_fingerprint(f, tool, blobs.get(old, b"")) for f in before)
+                for finding in after:
+                    fingerprint = _finding_fingerprint(finding, tool, blobs.get(new, b""))
+                    if remaining[fingerprint] > 0:
+                        remaining[fingerprint] -= 1
+                    else:
+                        introduced.append({"tool": tool, **finding, "commit": sha})
+                resolved += sum(remaining.values())
+        total += len(introduced)
+        report_commits.append({
+            "sha": sha,
+            "subject": subject,
+            "files": [path for path, _, _ in changes],
+            "introduced": introduced,
+            "resolved_count": resolved,
+        })
+
+    return {
+        "base": base,
+        "merge_base": merge_base(base),
+        "commit_count": len(commits),
+        "total_introduced": total,
+        "blob_cache": {"hits": cache.hits, "misses": cache.misses},
+        "tool_versions": TOOLS.snapshot(),
+        "skipped_tools": skipped_tools,
+        "commits": report_commits,
+    }
+
+
+def per_commit_markdown(report: dict) -> str:
+    lines = [
+        "# Security Audit: Per-Commit Attribution",
+        "",
+        f"- Base: `{report['base']}` (merge-base `{report['merge_base'][:12]}`)",
+        f"- Commits: `{report['commit_count']}`",
+        f"- Findings introduced: `{report['total_introduced']}`",
+        f"- Blob cache: `{report['blob_cache']['hits']}` hits, `{report['blob_cache']['misses']}` scanned",
+        "",
+        "| Commit | Subject | Files | Introduced | Resolved |",
+        "|---|---|---:|---:|---:|",
+    ]
+    for commit in report["commits"]:
+        lines.append(
+            f"| `{commit['sha'][:12]}` | {commit['subject']} | {len(commit['files'])} "
+            f"| {len(commit['introduced'])} | {commit['resolved_count']} |"
+        )
+    for commit in report["commits"]:
+        if not commit["introduced"]:
+            continue
+        lines.extend(["", f"## `{commit['sha'][:12]}` {commit['subject']}", ""])
+        for finding in commit["introduced"]:
+            lines.append(f"- **{finding['tool']}** `{finding['rule']}` at `{finding['path']}:{finding['line']}`: {finding['message']}")
+    for tool, reason in report["skipped_tools"].items():
+        lines.append(f"\n_{tool} skipped ({reason})._")
+    return "\n".join(lines) + "\n"
+
+
+def cmd_scan_per_commit(args: argparse.Namespace, output_dir: Path) -> int:
+    config = load_audit_config(args.base, args.config)
+    exclude_globs = [] if args.no_prefilter else [
+        *config["prefilter"].get("exclude_globs", []), *(args.exclude_glob or [])
+    ]
+    report = per_commit_audit(args.base, output_dir, exclude_globs, config)
+    write_text(output_dir / "per-commit.json", json.dumps(report, indent=2) + "\n")
+    write_text(output_dir / "per-commit.md", per_commit_markdown(report))
+    if getattr(args, "format", "json") == "ndjson":
+        # One record per commit followed by its introduced findings, then a
+        # closing summary without the nested commit list.
+        for commit in report["commits"]:
+            introduced = commit["introduced"]
+            print(json.dumps({"type": "commit", **{k: v for k, v in commit.items() if k != "introduced"}, "introduced_count": len(introduced)}))
+            for finding in introduced:
+                print(json.dumps({"type": "finding", **finding}))
+        print(json.dumps({"type": "summary", **{k: v for k, v in report.items() if k != "commits"}}))
+    else:
+        print(json.dumps(report, indent=2))
+    if args.fail_on_findings and report["total_introduced"]:
+        return 1
+    return 0
 
 
 def cmd_scan(args: argparse.Namespace) -> int:
     output_dir = Path(args.output_dir).resolve()
     output_dir.mkdir(parents=True, exist_ok=True)
+    TOOLS.attach(output_dir / "tool-registry.json")
+
+    paths_from = getattr(args, "paths_from", None)
+    if getattr(args, "per_commit", False):
+        if paths_from:
+            raise SystemExit("--per-commit needs git history; it can't be combined with --paths-from")
+        return cmd_scan_per_commit(args, output_dir)
+
+    # An explicit path list replaces git diff discovery entirely; `base` is
+    # None from here on so nothing downstream asks git for a range.
+    base = None if paths_from else args.base
+    changed_files = read_path_list(paths_from) if paths_from else git_changed_files(args.base)
+    base_label = base or f"paths-from:{paths_from}"
+    config = load_audit_config(base, args.config)
+
+    # A verdict run (--fail-on-findings / ci) over a tree that already
+    # passed with the same scanners and settings can't turn up anything new.
+    pass_key = pass_cache_key(base, args, config, changed_files) if base and args.fail_on_findings else None
+    if pass_key and not args.force:
+        hit = load_pass_cache(output_dir).get(pass_key)
+        if hit:
+            record = {"cached": True, "base": base, **hit}
+            if getattr(args, "format", "json") == "ndjson":
+                print(json.dumps({"type": "summary", **record}))
+            else:
+                print(f"Tree already audited clean at {hit['recorded_at']} ({hit['head'][:12]}); skipping. Use --force to re-run.")
+            return 0
 
-    changed_files = git_changed_files(args.base)
     if not changed_files:
+        message = f"No changes vs {args.base}" if base else "No paths to audit"
         summary = {
-            "base": args.base,
+            "base": base_label,
             "changed_files": [],
             "changed_file_count": 0,
             "total_findings": 0,
             "tool_results": [],
-            "message": f"No changes vs {args.base}",
+            "excluded_files": [],
+            "message": message,
         }
         write_text(output_dir / "summary.json", json.dumps(summary, indent=2) + "\n")
         write_text(output_dir / "summary.md", "# Security Audit Summary\n\nNo changes to audit.\n")
-        print(f"No changes vs {args.base}")
+        if getattr(args, "format", "json") == "ndjson":
+            print(json.dumps({"type": "summary", **summary}))
+        else:
+            print(message)
         return 0
 
+    prefilter = dict(config["prefilter"])
+    if args.no_prefilter:
+        prefilter["enabled"] = False
+    prefilter["exclude_globs"] = [*prefilter.get("exclude_globs", []), *(args.exclude_glob or [])]
+    excluded = prefilter_files(changed_files, prefilter, merge_base(base) if base else None)
+    compression = args.compress or config["artifacts"].get("compression")
+
     results: list[CommandResult] = []
 
     # MCP-aware Semgrep path: if --use-mcp is set, try to route Semgrep through
     # the MCP server. On success, skip the subprocess Semgrep entry in the plan.
     # On failure (MCP unavailable or error), fall through to subprocess as
     # though --use-mcp wasn't passed.
-    mcp_semgrep = _try_mcp_scan(args, changed_files, output_dir)
-    if mcp_semgrep and mcp_semgrep.get("status") == "ok":
+    ndjson = getattr(args, "format", "json") == "ndjson"
+
+    def emit_findings(tool: str, artifact: Path) -> None:
+        # Stream each tool's findings as soon as its artifact is parsed, so
+        # consumers don't have to wait for the whole run.
+        for finding in iter_artifact_findings(tool, artifact):
+            sys.stdout.write(json.dumps({"type": "finding", **finding}) + "\n")
+        sys.stdout.flush()
+
+    progress_lock = threading.Lock()
+    progress_shown: dict[int, float] = {}
+
+    def report_progress(event: dict) -> None:
+        # Called from the MCP reader threads. ndjson gets every event; the
+        # text mode prints at most one stderr line per shard per second.
+        with progress_lock:
+            if ndjson:
+                sys.stdout.write(json.dumps({"type": "progress", **event}) + "\n")
+                sys.stdout.flush()
+                return
+            now = time.monotonic()
+            if now - progress_shown.get(event["shard"], 0.0) < 1.0:
+                return
+            progress_shown[event["shard"]] = now
+            total = f"/{event['total']:g}" if event["total"] is not None else ""
+            rate = f" ({event['rate_per_s']:g}/s)" if event["rate_per_s"] is not None else ""
+            print(f"semgrep shard {event['shard']}: {event['progress']:g}{total}{rate}", file=sys.stderr, flush=True)
+
+    mcp_semgrep = _try_mcp_scan(args, changed_files, output_dir, excluded, report_progress)
+    if mcp_semgrep:
+        # A failed attempt is recorded too (status `warning`, with the MCP
+        # error and any shard timings) next to the subprocess fallback.
+        if mcp_semgrep["status"] == "ok":
+            if compression and Path(mcp_semgrep["artifact"]).exists():
+                mcp_semgrep["artifact"] = str(compress_artifact(Path(mcp_semgrep["artifact"]), compression))
+            if ndjson:
+                emit_findings("semgrep", Path(mcp_semgrep["artifact"]))
         results.append(
             CommandResult(
                 name=mcp_semgrep["name"],
@@ -572,28 +2185,220 @@ def cmd_scan(args: argparse.Namespace) -> int:
                 stdout="",
                 stderr="",
                 skipped_reason=mcp_semgrep["skipped_reason"],
+                shards=mcp_semgrep.get("shards"),
             )
         )
 
-    for name, command, artifact, required_binary in build_tool_plan(args.base, changed_files, output_dir, args.deep):
-        # Skip subprocess Semgrep when MCP successfully handled it.
-        if name == "semgrep" and mcp_semgrep and mcp_semgrep.get("status") == "ok":
-            continue
-        result = run_tool(name, command, artifact, required_binary)
-        persist_artifact_output(result, artifact)
-        results.append(result)
-
-    summary = make_summary(args.base, changed_files, results)
+    # Point osv-scanner/trivy at a sparse copy of just the manifests and IaC
+    # this diff touched, so they scale with the diff rather than the repo.
+    # --deep keeps the full-repo SCA the skill documents for that mode. With
+    # an explicit path list the workspace also holds the listed files, and
+    # is what the secrets scanners walk in place of git history.
+    workspace = None
+    sparse = bool(paths_from) or not (args.deep or args.no_sparse)
+    try:
+        if paths_from:
+            staged = {*sparse_workspace_files(classify_files(changed_files)), *(f for f in changed_files if f not in excluded)}
+            workspace = build_sparse_workspace(sorted(staged))
+        elif sparse:
+            workspace = build_sparse_workspace(sparse_workspace_files(classify_files(changed_files)))
+        plan = build_tool_plan(base, changed_files, output_dir, args.deep, excluded, workspace, sparse)
+        for name, command, artifact, required_binary in plan:
+            # Skip subprocess Semgrep when MCP successfully handled it.
+            if name == "semgrep" and mcp_semgrep and mcp_semgrep.get("status") == "ok":
+                continue
+            result = run_tool(name, command, artifact, required_binary, tool_limits(config, name))
+            persist_artifact_output(result, artifact)
+            if workspace and artifact and artifact.exists():
+                remap_artifact_paths(artifact, workspace)
+            if compression and artifact and artifact.exists():
+                artifact = compress_artifact(artifact, compression)
+                result.artifact = str(artifact)
+            results.append(result)
+            # run_tool cleared the previous run's artifact, so one that
+            # exists now was written by this invocation.
+            if ndjson and artifact and result.returncode is not None and artifact.exists():
+                emit_findings(name, artifact)
+    finally:
+        if workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    saved = None
+    if excluded:
+        plan_files = per_file_targets(changed_files, classify_files(changed_files))
+        if base:
+            plan_files.pop("semgrep")  # scans via --baseline-commit, not the file list
+        saved = estimate_prefilter_savings(excluded, results, plan_files)
+    summary = make_summary(base_label, changed_files, results, excluded, saved)
     write_text(output_dir / "summary.json", json.dumps(summary, indent=2) + "\n")
     write_text(output_dir / "summary.md", summary_markdown(summary))
+    clean = summary["total_findings"] == 0 and not any(
+        result.status in {"error", "resource_limited"} for result in results
+    )
+    if pass_key and clean:
+        record_pass(output_dir, pass_key, base, summary)
 
-    print(json.dumps(summary, indent=2))
+    if ndjson:
+        # Closing record so stream consumers know the run finished.
+        print(json.dumps({"type": "summary", **summary}))
+    else:
+        print(json.dumps(summary, indent=2))
 
     if args.fail_on_findings and summary["total_findings"]:
         return 1
     return 0
 
 
+WATCH_TOOLS = ("semgrep", "bandit", "eslint-security", "lizard")
+
+
+def worktree_snapshot(skip_prefixes: tuple[str, ...] = (".artifacts/",)) -> dict[str, tuple[int, int]]:
+    """`{path: (mtime_ns, size)}` for every tracked or untracked-but-not-
+    ignored file, so `watch` sees new files without walking ignored trees.
+    Paths under `skip_prefixes` (the runner's own output) are left out."""
+    listed = run(["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"], check=False)
+    snapshot: dict[str, tuple[int, int]] = {}
+    for path in filter(None, listed.stdout.split("\0")):
+        if path.startswith(skip_prefixes):
+            continue
+        try:
+            st = (ROOT / path).stat()
+        except OSError:
+            continue
+        snapshot[path] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+def watch_batch(
+    changed: list[str],
+    output_dir: Path,
+    config: dict,
+    findings: dict[tuple[str, str], dict[str, dict]],
+) -> tuple[list[dict], list[dict]]:
+    """Re-run the per-file tools on `changed` and update the warm
+    `findings` map (`(tool, path) -> {fingerprint: finding}`) in place.
+    Returns the `(new, resolved)` findings for this batch."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    present = [path for path in changed if (ROOT / path).is_file()]
+    excluded = prefilter_files(present, config["prefilter"]) if present else {}
+    targets = per_file_targets(present, classify_files(present), excluded)
+    plan = [
+        entry
+        for entry in (build_tool_plan(None, present, output_dir, False, excluded) if present else [])
+        if entry[0] in WATCH_TOOLS
+    ]
+
+    def run_one(entry: tuple[str, list[str], Path | None, str]) -> tuple[str, CommandResult]:
+        name, command, artifact, required_binary = entry
+        result = run_tool(name, command, artifact, required_binary, tool_limits(config, name))
+        persist_artifact_output(result, artifact)
+        return name, result
+
+    refreshed: dict[tuple[str, str], dict[str, dict]] = {}
+    with ThreadPoolExecutor(max_workers=len(plan) or 1) as pool:
+        for name, result in pool.map(run_one, plan):
+            if result.status not in {"ok", "warning"}:
+                continue  # keep the last good results for a tool that couldn't run
+            for path in targets[name]:
+                refreshed[(name, path)] = {}
+            for finding in iter_artifact_findings(name, Path(result.artifact)) if result.artifact else []:
+                path = finding.get("path") or ""
+                if os.path.isabs(path):
+                    path = os.path.relpath(path, ROOT)
+                finding["path"] = path
+                refreshed.setdefault((name, path), {})[finding["fingerprint"]] = finding
+    # Deleted and newly excluded files resolve everything they had open.
+    gone = {path for path in changed if path not in present or path in excluded}
+    for key in findings:
+        if key[1] in gone:
+            refreshed.setdefault(key, {})
+
+    new: list[dict] = []
+    resolved: list[dict] = []
+    for key, current in refreshed.items():
+        previous = findings.get(key, {})
+        new.extend(finding for fp, finding in current.items() if fp not in previous)
+        resolved.extend(finding for fp, finding in previous.items() if fp not in current)
+        if current:
+            findings[key] = current
+        else:
+            findings.pop(key, None)
+    return new, resolved
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    """Poll the working tree and re-run the per-file scanners on each
+    debounced batch of saved files, streaming findings as they appear and
+    resolve. Findings stay in memory for the life of the process."""
+    output_dir = Path(args.output_dir).resolve() / "watch"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    TOOLS.attach(output_dir.parent / "tool-registry.json")
+    config = load_audit_config("HEAD", args.config)
+    ndjson = args.format == "ndjson"
+    findings: dict[tuple[str, str], dict[str, dict]] = {}
+    skip = (".artifacts/",)
+    if output_dir.is_relative_to(ROOT):
+        skip += (output_dir.parent.relative_to(ROOT).as_posix() + "/",)
+
+    def report(changed: list[str]) -> None:
+        started = time.monotonic()
+        new, resolved = watch_batch(changed, output_dir, config, findings)
+        elapsed = round(time.monotonic() - started, 3)
+        open_count = sum(len(entries) for entries in findings.values())
+        if ndjson:
+            for finding in new:
+                sys.stdout.write(json.dumps({"type": "finding", **finding}) + "\n")
+            for finding in resolved:
+                sys.stdout.write(json.dumps({"type": "resolved", **finding}) + "\n")
+            sys.stdout.write(json.dumps({
+                "type": "batch",
+                "files": changed,
+                "duration_s": elapsed,
+                "new": len(new),
+                "resolved": len(resolved),
+                "open": open_count,
+            }) + "\n")
+        else:
+            for finding in new:
+                print(f"+ [{finding['tool']}] {finding['path']}:{finding.get('line') or '?'} {finding['rule']}: {finding['message']}")
+            for finding in resolved:
+                print(f"- [{finding['tool']}] {finding['path']}:{finding.get('line') or '?'} {finding['rule']}")
+            stamp = time.strftime("%H:%M:%S")
+            print(f"[{stamp}] {len(changed)} file(s) in {elapsed}s: {len(new)} new, {len(resolved)} resolved, {open_count} open")
+        sys.stdout.flush()
+
+    snapshot = worktree_snapshot(skip)
+    if args.base:
+        initial = git_changed_files(args.base)
+        if initial:
+            report(initial)
+    if not ndjson:
+        print(f"Watching {len(snapshot)} files (Ctrl-C to stop)", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(args.interval)
+            current = worktree_snapshot(skip)
+            changed = {path for path in current.keys() | snapshot.keys() if current.get(path) != snapshot.get(path)}
+            if not changed:
+                continue
+            # Debounce: editors save in bursts (write, rename, chmod), so
+            # keep collecting until the tree has been quiet for a while.
+            quiet_since = time.monotonic()
+            while time.monotonic() - quiet_since < args.debounce:
+                time.sleep(min(args.interval, args.debounce))
+                latest = worktree_snapshot(skip)
+                burst = {path for path in latest.keys() | current.keys() if latest.get(path) != current.get(path)}
+                if burst:
+                    changed |= burst
+                    quiet_since = time.monotonic()
+                current = latest
+            snapshot = current
+            report(sorted(changed))
+    except KeyboardInterrupt:
+        return 0
+
+
 def cmd_comment(args: argparse.Namespace) -> int:
     output_dir = Path(args.output_dir).resolve()
     summary_path = output_dir / "summary.md"
@@ -665,6 +2470,239 @@ def cmd_comment(args: argparse.Namespace) -> int:
     return result.returncode
 
 
+def gc_entries(root: Path) -> list[tuple[float, int, Path]]:
+    """List the eviction units under an artifact directory as (last used,
+    bytes, path). Each top-level file or run directory is one unit; blob
+    cache entries are evicted individually so a hot cache survives."""
+    entries: list[tuple[float, int, Path]] = []
+    if not root.is_dir():
+        return entries
+    for child in root.iterdir():
+        if child.is_dir() and not child.is_symlink():
+            files = [f for f in child.rglob("*") if f.is_file() and not f.is_symlink()]
+            if child.name == "blob-cache":
+                for f in files:
+                    st = f.stat()
+                    entries.append((st.st_mtime, st.st_size, f))
+                continue
+            stats = [f.stat() for f in files]
+            last_used = max((st.st_mtime for st in stats), default=child.stat().st_mtime)
+            entries.append((last_used, sum(st.st_size for st in stats), child))
+        else:
+            st = child.lstat()
+            entries.append((st.st_mtime, st.st_size, child))
+    return entries
+
+
+def plan_gc(entries: list[tuple[float, int, Path]], budget_bytes: int, max_age_s: float, now: float) -> list[tuple[float, int, Path]]:
+    """Pick entries to evict: everything older than `max_age_s`, then the
+    least recently used until the rest fits in `budget_bytes`."""
+    entries = sorted(entries, key=lambda entry: entry[0])
+    total = sum(size for _, size, _ in entries)
+    evict = []
+    for entry in entries:
+        last_used, size, _ = entry
+        if now - last_used > max_age_s or total > budget_bytes:
+            evict.append(entry)
+            total -= size
+    return evict
+
+
+def cmd_gc(args: argparse.Namespace) -> int:
+    settings = load_audit_config("HEAD", args.config)["artifacts"]
+    budget_mb = args.budget_mb if args.budget_mb is not None else settings.get("budget_mb", 1024)
+    max_age_days = args.max_age_days if args.max_age_days is not None else settings.get("max_age_days", 30)
+    roots = [Path(d).resolve() for d in args.dir] if args.dir else ARTIFACT_DIRS
+    now = time.time()
+    entries = [entry for root in roots for entry in gc_entries(root)]
+    evict = plan_gc(entries, int(budget_mb * 1024 * 1024), max_age_days * 86400, now)
+    for _, _, path in evict:
+        if args.dry_run:
+            continue
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+            # Drop the blob cache's fan-out dirs once they empty out.
+            for parent in path.parents:
+                if parent.name == "blob-cache" or parent in roots:
+                    break
+                try:
+                    parent.rmdir()
+                except OSError:
+                    break
+    freed = sum(size for _, size, _ in evict)
+    report = {
+        "dry_run": args.dry_run,
+        "roots": [str(root) for root in roots],
+        "budget_mb": budget_mb,
+        "max_age_days": max_age_days,
+        "evicted": [
+            {"path": str(path), "bytes": size, "age_days": round((now - last_used) / 86400, 2)}
+            for last_used, size, path in evict
+        ],
+        "freed_bytes": freed,
+        "retained_bytes": sum(size for _, size, _ in entries) - freed,
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+class LedgerError(ValueError):
+    """Raised when a row does not match the ledger's schema."""
+
+
+def validate_verdict_row(row: dict) -> list[str]:
+    """Schema check for one rule-stats.jsonl row (see SKILL.md "Per-rule
+    FP/TP ledger"). Returns a list of problems; empty means valid."""
+    errors = []
+    for key in ("ts", "tool", "rule_id", "file", "reason"):
+        if not isinstance(row.get(key), str) or not row[key].strip():
+            errors.append(f"`{key}` must be a non-empty string")
+    if row.get("verdict") not in VERDICTS:
+        errors.append(f"`verdict` must be one of {sorted(VERDICTS)}")
+    confidence = row.get("confidence")
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0 <= confidence <= 1:
+        errors.append("`confidence` must be a number in [0, 1]")
+    if "line" in row and (isinstance(row["line"], bool) or not isinstance(row["line"], int)):
+        errors.append("`line` must be an integer")
+    if "human_override" in row and not isinstance(row["human_override"], bool):
+        errors.append("`human_override` must be a boolean")
+    return errors
+
+
+def validate_memory_row(row: dict) -> list[str]:
+    """Schema check for one pending-memories.jsonl row, mirroring the fields
+    `promote-memories` reads."""
+    errors = []
+    scope = row.get("scope")
+    if not isinstance(scope, dict):
+        return ["`scope` must be an object with `rule` and optional `paths`"]
+    if not isinstance(scope.get("rule"), str) or not scope["rule"].strip():
+        errors.append("`scope.rule` must be a non-empty string")
+    paths = scope.get("paths", [])
+    if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+        errors.append("`scope.paths` must be a list of glob strings")
+    if not isinstance(row.get("rationale"), str) or not row["rationale"].strip():
+        errors.append("`rationale` must be a non-empty string")
+    if "expires" in row and not isinstance(row["expires"], str):
+        errors.append("`expires` must be an ISO date string")
+    return errors
+
+
+LEDGERS: dict[str, tuple[Path, Callable[[dict], list[str]]]] = {
+    "rule-stats": (RULE_STATS_LEDGER, validate_verdict_row),
+    "pending-memories": (PENDING_MEMORIES_LEDGER, validate_memory_row),
+}
+
+
+@contextmanager
+def ledger_lock(fd: int) -> Iterator[None]:
+    """Hold an exclusive advisory lock on an open ledger file descriptor.
+
+    Every writer (LedgerWriter, promote-memories) takes this lock, so rows
+    from concurrent triage agents never interleave mid-line.
+    """
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class LedgerWriter:
+    """Batched, lock-guarded appender for the triage JSONL ledgers.
+
+    Rows are validated and serialized on `append()` and buffered in memory.
+    `flush()` takes the advisory lock, writes the whole batch with a single
+    O_APPEND write, and fsyncs once, so the per-row cost is a dict check
+    and a `json.dumps` rather than a syscall round-trip. Safe to share
+    between threads; separate processes coordinate through the file lock.
+
+        with LedgerWriter.for_ledger("rule-stats") as writer:
+            for row in verdicts:
+                writer.append(row)
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        validator: Callable[[dict], list[str]] | None = None,
+        batch_size: int = 500,
+        fsync: bool = True,
+    ) -> None:
+        self.path = path
+        self.validator = validator
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync
+        self.written = 0
+        self._buffer: list[str] = []
+        self._mutex = threading.Lock()
+
+    @classmethod
+    def for_ledger(cls, name: str, **kwargs) -> "LedgerWriter":
+        path, validator = LEDGERS[name]
+        return cls(path, validator, **kwargs)
+
+    def append(self, row: dict) -> None:
+        """Validate and buffer one row. Raises LedgerError on a schema
+        violation; the row is not buffered in that case."""
+        if not isinstance(row, dict):
+            raise LedgerError("row must be a JSON object")
+        if self.validator is not None:
+            errors = self.validator(row)
+            if errors:
+                raise LedgerError("; ".join(errors))
+        line = json.dumps(row, separators=(",", ":"), ensure_ascii=False)
+        with self._mutex:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._mutex:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        payload = ("\n".join(self._buffer) + "\n").encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            with ledger_lock(fd):
+                # A writer that crashed mid-line (or a bare `echo >>`) can
+                # leave the file without a trailing newline; don't glue our
+                # first row onto that fragment.
+                size = os.fstat(fd).st_size
+                if size and _last_byte(self.path, size) != b"\n":
+                    payload = b"\n" + payload
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(fd, view):]
+                if self.fsync:
+                    os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.written += len(self._buffer)
+        self._buffer.clear()
+
+    def __enter__(self) -> "LedgerWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.flush()
+
+
+def _last_byte(path: Path, size: int) -> bytes:
+    with path.open("rb") as fp:
+        fp.seek(size - 1)
+        return fp.read(1)
+
+
 def cmd_promote_memories(args: argparse.Namespace) -> int:
     """Promote pending suggested_memory entries into .claude/security-memories.md.
 
@@ -683,7 +2721,7 @@ def cmd_promote_memories(args: argparse.Namespace) -> int:
     import datetime
     from pathlib import Path as _Path
 
-    pending_path = ROOT / ".claude" / "security-audit" / "pending-memories.jsonl"
+    pending_path = PENDING_MEMORIES_LEDGER
     if not pending_path.exists():
         print(f"No pending memories at {pending_path}", file=sys.stderr)
         return 0
@@ -703,7 +2741,15 @@ def cmd_promote_memories(args: argparse.Namespace) -> int:
     rejected: list[tuple[str, str]] = []
     appended_blocks: list[str] = []
 
-    for raw in pending_path.read_text(encoding="utf-8").splitlines():
+    # Snapshot the ledger under the writer lock; rows appended after this
+    # point are left in place when the consumed prefix is cleared below.
+    with pending_path.open("rb") as fp, ledger_lock(fp.fileno()):
+        pending_bytes = fp.read()
+    # Only consume complete lines; a trailing fragment belongs to a writer
+    # that hasn't finished yet.
+    pending_bytes = pending_bytes[: pending_bytes.rfind(b"\n") + 1]
+
+    for raw in pending_bytes.decode("utf-8").splitlines():
         raw = raw.strip()
         if not raw:
             continue
@@ -776,13 +2822,26 @@ def cmd_promote_memories(args: argparse.Namespace) -> int:
         for rule, reason in rejected:
             print(f"  {rule}: {reason}", file=sys.stderr)
 
-    # Clear pending file after successful promotion
+    # Clear the promoted rows after successful promotion
     if promoted > 0 and not args.dry_run:
-        pending_path.unlink()
+        _drop_ledger_prefix(pending_path, len(pending_bytes))
 
     return 0
 
 
+def _drop_ledger_prefix(path: Path, nbytes: int) -> None:
+    """Remove the first `nbytes` of a ledger under the writer lock, keeping
+    any rows that concurrent writers appended after it was read. The file
+    is truncated rather than unlinked so a writer that opened it before
+    the lock was released never appends to an orphaned inode."""
+    with path.open("r+b") as fp, ledger_lock(fp.fileno()):
+        fp.seek(nbytes)
+        rest = fp.read()
+        fp.seek(0)
+        fp.write(rest)
+        fp.truncate()
+
+
 def cmd_rule_stats(args: argparse.Namespace) -> int:
     """Summarize .claude/security-audit/rule-stats.jsonl to identify rules
     with poor signal-to-noise in this repo. Append-only ledger; one row
@@ -790,7 +2849,7 @@ def cmd_rule_stats(args: argparse.Namespace) -> int:
     import datetime
     from collections import defaultdict
 
-    ledger = ROOT / ".claude" / "security-audit" / "rule-stats.jsonl"
+    ledger = RULE_STATS_LEDGER
     if not ledger.exists():
         print(f"No ledger at {ledger}", file=sys.stderr)
         return 0
@@ -865,6 +2924,219 @@ def cmd_rule_stats(args: argparse.Namespace) -> int:
     return 0
 
 
+def cmd_record_verdict(args: argparse.Namespace) -> int:
+    """Append triage rows to a ledger through LedgerWriter.
+
+    Rows come from repeated `--row '<json>'` flags or, when none are given,
+    from stdin as JSONL. Invalid rows are reported and skipped; valid rows
+    are written in batches under the ledger lock. `ts` defaults to now
+    (UTC) for rule-stats rows that omit it.
+    """
+    import datetime
+
+    sources: Iterable[str] = args.row or sys.stdin
+    now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    rejected: list[dict] = []
+
+    writer = LedgerWriter.for_ledger(args.ledger, batch_size=args.batch_size, fsync=not args.no_fsync)
+    if args.ledger_path:
+        writer.path = Path(args.ledger_path).resolve()
+    with writer:
+        for lineno, raw in enumerate(sources, start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                row = json.loads(raw)
+                if args.ledger == "rule-stats" and isinstance(row, dict):
+                    row.setdefault("ts", now)
+                writer.append(row)
+            except (json.JSONDecodeError, LedgerError) as exc:
+                rejected.append({"row": lineno, "error": str(exc)})
+
+    print(json.dumps({"ledger": str(writer.path), "written": writer.written, "rejected": rejected}))
+    for item in rejected:
+        print(f"  row {item['row']}: {item['error']}", file=sys.stderr)
+    return 1 if rejected else 0
+
+
+def rule_yaml_body(rule_path: Path) -> str:
+    """Return a rule file's YAML ready to append under an existing `rules:`
+    key. If the rule file is a full "rules:" doc, strip the header so we
+    don't duplicate the key."""
+    lines = [
+        line
+        for line in rule_path.read_text(encoding="utf-8").splitlines(keepends=True)
+        if line.strip() != "rules:"
+    ]
+    return "".join(lines) + "\n"
+
+
+def _empty_rule_result() -> dict:
+    return {
+        "stages": {
+            "schema": {"passed": False, "detail": ""},
+            "fires_on_vuln": {"passed": False, "detail": ""},
+            "silent_on_fixed": {"passed": False, "detail": ""},
+        },
+        "all_passed": False,
+        "appended_to": None,
+    }
+
+
+def _scan_rule_fixtures(rule_paths: list[Path], vuln_path: Path, fixed_path: Path) -> tuple[dict | None, str]:
+    """Scan a fixture pair with one or more rule files in a single semgrep
+    run. Returns (payload, schema_error); schema_error is non-empty when the
+    rules failed to load (non-zero exit or an `error`-level entry not
+    attributed to either target)."""
+    configs = [f"--config={path}" for path in rule_paths]
+    proc = run(
+        [
+            "semgrep", "scan", *configs, "--json", "--metrics=off",
+            "--no-git-ignore", str(vuln_path), str(fixed_path),
+        ],
+        check=False,
+    )
+    try:
+        payload = json.loads(proc.stdout or "")
+    except json.JSONDecodeError:
+        payload = None
+
+    targets = {str(vuln_path), str(fixed_path)}
+    config_errors = []
+    if isinstance(payload, dict):
+        config_errors = [
+            err
+            for err in payload.get("errors", [])
+            if isinstance(err, dict)
+            and err.get("level") == "error"
+            and _semgrep_target_path(err) not in targets
+        ]
+    if not isinstance(payload, dict) or proc.returncode not in (0, 1) or config_errors:
+        messages = [str(err.get("message", err)) for err in config_errors]
+        return None, ("\n".join(messages) or proc.stderr or proc.stdout or "semgrep failed").strip()[:500]
+    return payload, ""
+
+
+def _rule_stage_result(vuln_hits: int, fixed_hits: int) -> dict:
+    """Fill in the stages for a rule that loaded, given its match counts on
+    the vulnerable and fixed snippets."""
+    result = _empty_rule_result()
+    stages = result["stages"]
+    stages["schema"]["passed"] = True
+    stages["schema"]["detail"] = "Schema valid"
+
+    # Stage 2: fires on vulnerable snippet
+    if not vuln_hits:
+        stages["fires_on_vuln"]["detail"] = "Rule did not match vulnerable snippet"
+        return result
+    stages["fires_on_vuln"]["passed"] = True
+    stages["fires_on_vuln"]["detail"] = f"{vuln_hits} match(es)"
+
+    # Stage 3: silent on fixed snippet
+    if fixed_hits:
+        stages["silent_on_fixed"]["detail"] = (
+            f"Rule still fires on fixed snippet ({fixed_hits} match(es)). "
+            "Rule is too broad."
+        )
+        return result
+    stages["silent_on_fixed"]["passed"] = True
+    stages["silent_on_fixed"]["detail"] = "No matches on fixed snippet"
+
+    result["all_passed"] = True
+    return result
+
+
+def validate_rule_pair(rule_path: Path, vuln_path: Path, fixed_path: Path) -> dict:
+    """Run the deterministic validate-rule stages with one semgrep process.
+
+    Semgrep's startup and rule compilation dominate the cost of checking a
+    single rule, so instead of `--validate` plus one scan per snippet we
+    scan both snippets in one `--json` run and split the results by path.
+    A rule that fails to load surfaces as a config error in that same run,
+    which is what the schema stage reports.
+
+    Returns the stage dict documented on `cmd_validate_rule`, minus
+    `appended_to`. Later stages are left unpassed once an earlier one fails.
+    """
+    payload, schema_error = _scan_rule_fixtures([rule_path], vuln_path, fixed_path)
+    if payload is None:
+        result = _empty_rule_result()
+        result["stages"]["schema"]["detail"] = schema_error
+        return result
+
+    matches: dict[str, int] = {str(vuln_path): 0, str(fixed_path): 0}
+    for finding in payload.get("results", []):
+        path = _semgrep_target_path(finding)
+        if path in matches:
+            matches[path] += 1
+    return _rule_stage_result(matches[str(vuln_path)], matches[str(fixed_path)])
+
+
+_RULE_ID_RE = re.compile(r"""^\s*-\s*id:\s*["']?([^"'\s#]+)""", re.MULTILINE)
+
+
+def rule_ids(rule_path: Path) -> list[str]:
+    """Return the `id:` of every rule in a rule file, in file order."""
+    return _RULE_ID_RE.findall(rule_path.read_text(encoding="utf-8", errors="replace"))
+
+
+def validate_rule_batch(rule_paths: list[Path], vuln_path: Path, fixed_path: Path) -> dict[Path, dict]:
+    """Validate several distinct rules that share one fixture pair.
+
+    All rules go to a single semgrep run and each result is attributed back
+    to its rule file by rule id (semgrep reports `check_id` as the id
+    prefixed with the config's dotted path). Rules whose ids cannot be
+    attributed unambiguously, and every rule of a batch that fails to load,
+    fall back to their own `validate_rule_pair` run so one broken or
+    colliding rule never decides the verdict of the others.
+    """
+    if len(rule_paths) == 1:
+        return {rule_paths[0]: validate_rule_pair(rule_paths[0], vuln_path, fixed_path)}
+
+    owners: dict[str, list[Path]] = {}
+    for path in rule_paths:
+        for rule_id in rule_ids(path):
+            owners.setdefault(rule_id, []).append(path)
+    ambiguous = {path for paths in owners.values() if len(set(paths)) > 1 for path in paths}
+    batched = [path for path in rule_paths if path not in ambiguous and rule_ids(path)]
+    solo = [path for path in rule_paths if path not in batched]
+
+    results: dict[Path, dict] = {}
+    payload = None
+    if len(batched) > 1:
+        payload, _ = _scan_rule_fixtures(batched, vuln_path, fixed_path)
+    if payload is None:
+        solo = rule_paths
+    else:
+        hits = {path: {str(vuln_path): 0, str(fixed_path): 0} for path in batched}
+        # Longest id first, so `a.b` is not claimed by a rule named `b`.
+        by_length = sorted(owners.items(), key=lambda item: len(item[0]), reverse=True)
+        for finding in payload.get("results", []):
+            check_id = str(finding.get("check_id", ""))
+            target = _semgrep_target_path(finding)
+            for rule_id, paths in by_length:
+                if check_id == rule_id or check_id.endswith("." + rule_id):
+                    counts = hits.get(paths[0])
+                    if counts is not None and target in counts:
+                        counts[target] += 1
+                    break
+        for path in batched:
+            results[path] = _rule_stage_result(hits[path][str(vuln_path)], hits[path][str(fixed_path)])
+    for path in solo:
+        results[path] = validate_rule_pair(path, vuln_path, fixed_path)
+    return results
+
+
+def _semgrep_target_path(item: dict) -> str | None:
+    """Resolve the target path semgrep attached to a result or error, so it
+    can be compared against the absolute paths we passed in."""
+    path = item.get("path")
+    if not isinstance(path, str):
+        return None
+    return str((ROOT / path).resolve())
+
+
 def cmd_validate_rule(args: argparse.Namespace) -> int:
     """Run the Autogrep-style 4-stage filter on a candidate Semgrep rule.
 
@@ -875,12 +3147,11 @@ def cmd_validate_rule(args: argparse.Namespace) -> int:
       --append-to  (optional) If all filters pass, append the rule to this
                    file (typically .semgrep/repo-rules.yml).
 
-    Filter stages:
-      1. Schema validation: `semgrep scan --validate --config=<rule>`
-      2. Fires on vulnerable: `semgrep scan --config=<rule> <vuln>` must
-         emit at least one result.
-      3. Does NOT fire on fixed: `semgrep scan --config=<rule> <fixed>`
-         must emit zero results.
+    Filter stages (all three come from a single
+    `semgrep scan --json --config=<rule> <vuln> <fixed>` run):
+      1. Schema validation: the rule loads without config errors.
+      2. Fires on vulnerable: at least one result in <vuln>.
+      3. Does NOT fire on fixed: zero results in <fixed>.
       4. LLM quality scoring is intentionally NOT done here. The skill
          layer orchestrates the LLM step; this command emits a deterministic
          pass/fail that the skill can act on.
@@ -909,127 +3180,297 @@ def cmd_validate_rule(args: argparse.Namespace) -> int:
         print(json.dumps({"error": "missing dependency: semgrep"}), file=sys.stderr)
         return 2
 
-    result: dict[str, dict] = {
-        "stages": {
-            "schema": {"passed": False, "detail": ""},
-            "fires_on_vuln": {"passed": False, "detail": ""},
-            "silent_on_fixed": {"passed": False, "detail": ""},
-        },
-        "all_passed": False,
-        "appended_to": None,
-    }
-
-    # Stage 1: schema validation
-    sv = run(
-        ["semgrep", "scan", "--validate", f"--config={rule_path}", "--metrics=off"],
-        check=False,
-    )
-    if sv.returncode == 0:
-        result["stages"]["schema"]["passed"] = True
-        result["stages"]["schema"]["detail"] = "Schema valid"
-    else:
-        result["stages"]["schema"]["detail"] = (sv.stderr or sv.stdout).strip()[:500]
-        print(json.dumps(result))
-        return 1
-
-    # Stage 2: fires on vulnerable snippet
-    sv_out = run(
-        [
-            "semgrep", "scan", f"--config={rule_path}", "--json", "--metrics=off",
-            "--no-git-ignore", str(vuln_path),
-        ],
-        check=False,
-    )
-    try:
-        vuln_results = json.loads(sv_out.stdout or "{}").get("results", [])
-    except json.JSONDecodeError:
-        vuln_results = []
-    if vuln_results:
-        result["stages"]["fires_on_vuln"]["passed"] = True
-        result["stages"]["fires_on_vuln"]["detail"] = f"{len(vuln_results)} match(es)"
-    else:
-        result["stages"]["fires_on_vuln"]["detail"] = "Rule did not match vulnerable snippet"
-        print(json.dumps(result))
-        return 1
-
-    # Stage 3: silent on fixed snippet
-    sf_out = run(
-        [
-            "semgrep", "scan", f"--config={rule_path}", "--json", "--metrics=off",
-            "--no-git-ignore", str(fixed_path),
-        ],
-        check=False,
-    )
-    try:
-        fixed_results = json.loads(sf_out.stdout or "{}").get("results", [])
-    except json.JSONDecodeError:
-        fixed_results = []
-    if not fixed_results:
-        result["stages"]["silent_on_fixed"]["passed"] = True
-        result["stages"]["silent_on_fixed"]["detail"] = "No matches on fixed snippet"
-    else:
-        result["stages"]["silent_on_fixed"]["detail"] = (
-            f"Rule still fires on fixed snippet ({len(fixed_results)} match(es)). "
-            "Rule is too broad."
-        )
+    result = validate_rule_pair(rule_path, vuln_path, fixed_path)
+    if not result["all_passed"]:
         print(json.dumps(result))
         return 1
 
-    result["all_passed"] = True
-
     # Optional append to repo-rules.yml
     if args.append_to and result["all_passed"]:
         target = Path(args.append_to).resolve()
         target.parent.mkdir(parents=True, exist_ok=True)
-        rule_yaml = rule_path.read_text(encoding="utf-8")
         if not target.exists():
             target.write_text("rules:\n", encoding="utf-8")
         with target.open("a", encoding="utf-8") as fp:
-            # If the rule file is a full "rules:" doc, strip the header
-            # before appending so we don't duplicate the "rules:" key.
-            for line in rule_yaml.splitlines(keepends=True):
-                if line.strip() == "rules:":
-                    continue
-                fp.write(line)
-            fp.write("\n")
+            fp.write(rule_yaml_body(rule_path))
         result["appended_to"] = str(target)
 
     print(json.dumps(result, indent=2))
     return 0 if result["all_passed"] else 1
 
 
+def load_fixture_manifest(manifest_path: Path) -> dict[str, tuple[Path, Path]]:
+    """Parse a validate-rules fixtures manifest.
+
+    The manifest is JSON mapping each rule file name (relative to the rules
+    directory, or its stem) to its snippet pair; snippet paths are relative
+    to the manifest's own directory:
+
+        {"sqli-template.yml": {"vuln": "sqli/vuln.ts", "fixed": "sqli/fixed.ts"}}
+    """
+    payload = load_json(manifest_path)
+    if not isinstance(payload, dict):
+        raise SystemExit(f"Fixtures manifest must be a JSON object: {manifest_path}")
+    base = manifest_path.parent
+    fixtures: dict[str, tuple[Path, Path]] = {}
+    for key, entry in payload.items():
+        if not isinstance(entry, dict) or not entry.get("vuln") or not entry.get("fixed"):
+            raise SystemExit(f"Fixtures manifest entry {key!r} needs `vuln` and `fixed` paths")
+        fixtures[key] = ((base / entry["vuln"]).resolve(), (base / entry["fixed"]).resolve())
+    return fixtures
+
+
+def _validate_rule_batch_job(rule_paths: list[Path], vuln_path: Path, fixed_path: Path) -> list[dict]:
+    started = time.monotonic()
+    missing = [str(p) for p in (vuln_path, fixed_path) if not p.exists()]
+    if missing:
+        error: dict = {"error": f"missing: {', '.join(missing)}", "all_passed": False}
+        results = {path: error for path in rule_paths}
+    else:
+        results = validate_rule_batch(rule_paths, vuln_path, fixed_path)
+    elapsed = round(time.monotonic() - started, 3)
+    rows = []
+    for path in rule_paths:
+        result = dict(results[path])
+        result.pop("appended_to", None)
+        rows.append({"rule": str(path), "vuln": str(vuln_path), "fixed": str(fixed_path), **result, "elapsed_s": elapsed})
+    return rows
+
+
+def append_rules_atomically(target: Path, rule_paths: list[Path]) -> int:
+    """Append several rules to a rules file as one atomic replace, so a
+    concurrent reader never sees a half-appended corpus. Returns the number
+    of rule bodies written."""
+    import tempfile
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    existing = target.read_text(encoding="utf-8") if target.exists() else "rules:\n"
+    if not existing.endswith("\n"):
+        existing += "\n"
+    # Byte-identical candidates (the same rule proposed twice) land once.
+    bodies = dict.fromkeys(rule_yaml_body(path) for path in rule_paths)
+    content = existing + "".join(bodies)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            fp.write(content)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_name, target)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return len(bodies)
+
+
+def cmd_validate_rules(args: argparse.Namespace) -> int:
+    """Run validate-rule over a directory of candidate rules in parallel.
+
+    Each rule is paired with its (vuln, fixed) snippets via the fixtures
+    manifest (see `load_fixture_manifest`) and validated with the same
+    single-invocation pipeline as `validate-rule`. Distinct rules that share
+    a fixture pair are batched into one semgrep run (see
+    `validate_rule_batch`), and byte-identical rules are validated once. A
+    batch that raises is reported as an error row against each of its
+    rules rather than aborting the command. One NDJSON line per rule
+    is written to --report (default stdout) as results complete. With
+    --append-to, every passing rule is appended in a single atomic write
+    once all rules are done.
+    """
+    import hashlib
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    rules_dir = Path(args.rules_dir).resolve()
+    manifest_path = Path(args.fixtures).resolve()
+    for p in (rules_dir, manifest_path):
+        if not p.exists():
+            print(json.dumps({"error": f"missing: {p}"}), file=sys.stderr)
+            return 2
+    if not command_exists("semgrep"):
+        print(json.dumps({"error": "missing dependency: semgrep"}), file=sys.stderr)
+        return 2
+
+    fixtures = load_fixture_manifest(manifest_path)
+    rule_paths = sorted(p for p in rules_dir.iterdir() if p.suffix in {".yml", ".yaml"} and p.is_file())
+
+    report = open(args.report, "w", encoding="utf-8") if args.report else sys.stdout
+    rows: list[dict] = []
+
+    def emit(row: dict) -> None:
+        rows.append(row)
+        report.write(json.dumps(row) + "\n")
+        report.flush()
+
+    # Group by fixture pair so distinct rules share one semgrep run, and by
+    # content within a pair so byte-identical duplicates are validated once.
+    batches: dict[tuple[Path, Path], dict[str, list[Path]]] = {}
+    for rule_path in rule_paths:
+        pair = fixtures.get(rule_path.name) or fixtures.get(rule_path.stem)
+        if pair is None:
+            emit({"rule": str(rule_path), "error": "no fixtures in manifest", "all_passed": False})
+            continue
+        digest = hashlib.sha256(rule_path.read_bytes()).hexdigest()
+        batches.setdefault(pair, {}).setdefault(digest, []).append(rule_path)
+
+    # Every job is a semgrep subprocess, so threads give full parallelism
+    # without pickling results across a process boundary.
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count() or 1) as pool:
+            futures = {
+                pool.submit(_validate_rule_batch_job, [paths[0] for paths in by_digest.values()], vuln, fixed): by_digest
+                for (vuln, fixed), by_digest in batches.items()
+            }
+            for future in as_completed(futures):
+                by_digest = futures[future]
+                try:
+                    batch_rows = future.result()
+                except Exception as exc:
+                    batch_rows = [
+                        {"rule": str(paths[0]), "error": f"{type(exc).__name__}: {exc}", "all_passed": False}
+                        for paths in by_digest.values()
+                    ]
+                for row, paths in zip(batch_rows, by_digest.values()):
+                    for rule_path in paths:
+                        emit({**row, "rule": str(rule_path)})
+    finally:
+        if report is not sys.stdout:
+            report.close()
+
+    passing = sorted(Path(row["rule"]) for row in rows if row.get("all_passed"))
+    appended = 0
+    if args.append_to and passing:
+        appended = append_rules_atomically(Path(args.append_to).resolve(), passing)
+
+    print(
+        f"Validated {len(rows)} rule(s): {len(passing)} passed, {len(rows) - len(passing)} failed"
+        + (f"; appended {appended} to {args.append_to}" if appended else ""),
+        file=sys.stderr,
+    )
+    return 0 if rows and len(passing) == len(rows) else 1
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description=__doc__)
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     scan = subparsers.add_parser("scan", help="Run tool-driven security audit against a git diff.")
     scan.add_argument("--base", default="origin/HEAD", help="Git base ref to diff against.")
+    scan.add_argument(
+        "--paths-from",
+        metavar="FILE",
+        help="Audit this NUL-delimited path list (`-` for stdin) instead of `git diff <base>...`. History-based tools degrade to directory scans.",
+    )
     scan.add_argument("--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="Artifact output directory.")
     scan.add_argument("--deep", action="store_true", help="Enable deep mode add-ons such as trufflehog.")
+    scan.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        default="json",
+        help="stdout format. `ndjson` streams one normalized finding per line as each tool finishes, then a summary record.",
+    )
     scan.add_argument("--fail-on-findings", action="store_true", help="Exit non-zero if findings are detected.")
     scan.add_argument(
         "--use-mcp",
         action="store_true",
         help="Route Semgrep through the Semgrep MCP server (requires `uvx` or `semgrep-mcp`). Falls back to subprocess on failure. See references/mcp-integration.md.",
     )
+    scan.add_argument(
+        "--mcp-shards",
+        type=int,
+        default=0,
+        help=f"With --use-mcp, split the changed files across this many MCP servers. Default: one per {MCP_SHARD_MIN_FILES} files, at most {MCP_MAX_SHARDS} or the CPU count.",
+    )
+    scan.add_argument("--config", help="Audit config JSON (default: .claude/security-audit/config.json read from --base).")
+    scan.add_argument(
+        "--exclude-glob",
+        action="append",
+        help="Extra glob the per-file scanners skip (repeatable). Added to the config's prefilter.exclude_globs.",
+    )
+    scan.add_argument("--no-prefilter", action="store_true", help="Send every changed file to the per-file scanners.")
+    scan.add_argument(
+        "--per-commit",
+        action="store_true",
+        help="Attribute per-file scanner findings to the commit in merge-base..HEAD that introduced them (writes per-commit.json/.md).",
+    )
+    scan.add_argument(
+        "--no-sparse",
+        action="store_true",
+        help="Run osv-scanner/trivy over the whole checkout instead of a sparse workspace of the changed manifests and IaC.",
+    )
+    scan.add_argument(
+        "--force",
+        action="store_true",
+        help="With --fail-on-findings, re-run even if this exact tree already passed with the same scanners.",
+    )
+    scan.add_argument(
+        "--compress",
+        choices=["gzip", "zstd"],
+        help="Compress tool artifacts after each run (overrides artifacts.compression in the config).",
+    )
     scan.set_defaults(func=cmd_scan)
 
     ci = subparsers.add_parser("ci", help="CI-friendly alias for scan with non-zero exit on findings.")
     ci.add_argument("--base", default="origin/HEAD", help="Git base ref to diff against.")
+    ci.add_argument(
+        "--paths-from",
+        metavar="FILE",
+        help="Audit this NUL-delimited path list (`-` for stdin) instead of `git diff <base>...`. History-based tools degrade to directory scans.",
+    )
     ci.add_argument("--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="Artifact output directory.")
     ci.add_argument("--deep", action="store_true", help="Enable deep mode add-ons such as trufflehog.")
+    ci.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        default="json",
+        help="stdout format. `ndjson` streams one normalized finding per line as each tool finishes, then a summary record.",
+    )
     ci.add_argument(
         "--use-mcp",
         action="store_true",
         help="Route Semgrep through the Semgrep MCP server. See references/mcp-integration.md.",
     )
+    ci.add_argument("--mcp-shards", type=int, default=0, help=f"With --use-mcp, MCP servers to shard across. Default: one per {MCP_SHARD_MIN_FILES} files, at most {MCP_MAX_SHARDS} or the CPU count.")
+    ci.add_argument("--config", help="Audit config JSON (default: .claude/security-audit/config.json read from --base).")
+    ci.add_argument("--exclude-glob", action="append", help="Extra glob the per-file scanners skip (repeatable).")
+    ci.add_argument("--no-prefilter", action="store_true", help="Send every changed file to the per-file scanners.")
+    ci.add_argument("--no-sparse", action="store_true", help="Run osv-scanner/trivy over the whole checkout.")
+    ci.add_argument("--compress", choices=["gzip", "zstd"], help="Compress tool artifacts after each run.")
+    ci.add_argument("--force", action="store_true", help="Re-run even if this exact tree already passed with the same scanners.")
     ci.set_defaults(func=lambda args: cmd_scan(argparse.Namespace(**vars(args), fail_on_findings=True)))
 
+    watch = subparsers.add_parser(
+        "watch",
+        help="Re-run the per-file scanners (semgrep, bandit, eslint-security, lizard) on files as they are saved.",
+    )
+    watch.add_argument("--base", help="Scan files changed vs this ref once at startup, before watching.")
+    watch.add_argument("--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="Artifact output directory (watch uses its `watch/` subdirectory).")
+    watch.add_argument("--config", help="Audit config JSON (default: .claude/security-audit/config.json at HEAD).")
+    watch.add_argument("--interval", type=float, default=0.25, help="Seconds between working-tree polls. Default: 0.25.")
+    watch.add_argument("--debounce", type=float, default=0.3, help="Quiet period before a batch of saves is scanned. Default: 0.3.")
+    watch.add_argument(
+        "--format",
+        choices=["text", "ndjson"],
+        default="text",
+        help="`ndjson` streams finding/resolved/batch records instead of text lines.",
+    )
+    watch.set_defaults(func=cmd_watch)
+
     comment = subparsers.add_parser("comment", help="Post the latest markdown summary to a GitHub PR.")
     comment.add_argument("--pr", required=True, help="Pull request number.")
     comment.add_argument("--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="Artifact output directory.")
     comment.set_defaults(func=cmd_comment)
 
+    gc = subparsers.add_parser(
+        "gc",
+        help="Evict old and least recently used entries under .artifacts/security-audit and .artifacts/code-quality to stay under a disk budget.",
+    )
+    gc.add_argument("--dir", action="append", help="Artifact directory to collect (repeatable). Default: both runners' output dirs.")
+    gc.add_argument("--budget-mb", type=float, help="Disk budget across all directories. Default: artifacts.budget_mb (1024).")
+    gc.add_argument("--max-age-days", type=float, help="Evict entries unused for longer than this. Default: artifacts.max_age_days (30).")
+    gc.add_argument("--config", help="Audit config JSON (default: .claude/security-audit/config.json at HEAD).")
+    gc.add_argument("--dry-run", action="store_true", help="Report what would be evicted without deleting.")
+    gc.set_defaults(func=cmd_gc)
+
     vr = subparsers.add_parser(
         "validate-rule",
         help="Autogrep-style filter: validate a candidate Semgrep rule against (vuln, fixed) snippet pair.",
@@ -1040,6 +3481,21 @@ def build_parser() -> argparse.ArgumentParser:
     vr.add_argument("--append-to", help="If all filters pass, append the rule to this file.")
     vr.set_defaults(func=cmd_validate_rule)
 
+    vrs = subparsers.add_parser(
+        "validate-rules",
+        help="Validate a directory of candidate Semgrep rules in parallel against a fixtures manifest.",
+    )
+    vrs.add_argument("--rules-dir", required=True, help="Directory of candidate rule YAML files.")
+    vrs.add_argument(
+        "--fixtures",
+        required=True,
+        help='JSON manifest mapping rule file name (or stem) to {"vuln": ..., "fixed": ...} snippet paths.',
+    )
+    vrs.add_argument("--jobs", type=int, default=0, help="Parallel semgrep runs. Default: CPU count.")
+    vrs.add_argument("--report", help="Write the NDJSON report here instead of stdout.")
+    vrs.add_argument("--append-to", help="Append every passing rule to this file in one atomic write.")
+    vrs.set_defaults(func=cmd_validate_rules)
+
     promote = subparsers.add_parser(
         "promote-memories",
         help="Promote pending suggested_memory entries to .claude/security-memories.md (with T8 safety filters).",
@@ -1058,6 +3514,17 @@ def build_parser() -> argparse.ArgumentParser:
     stats.add_argument("--min-total", type=int, default=3, help="Minimum triage count before suggesting changes. Default: 3.")
     stats.set_defaults(func=cmd_rule_stats)
 
+    record = subparsers.add_parser(
+        "record-verdict",
+        help="Append triage rows to rule-stats.jsonl or pending-memories.jsonl (schema-checked, batched, file-locked).",
+    )
+    record.add_argument("--ledger", choices=sorted(LEDGERS), default="rule-stats", help="Which ledger to append to. Default: rule-stats.")
+    record.add_argument("--row", action="append", help="One JSON row. Repeatable. If omitted, rows are read from stdin as JSONL.")
+    record.add_argument("--ledger-path", help="Override the ledger file location (default: .claude/security-audit/<ledger>.jsonl).")
+    record.add_argument("--batch-size", type=int, default=500, help="Rows per locked append + fsync. Default: 500.")
+    record.add_argument("--no-fsync", action="store_true", help="Skip the per-batch fsync (faster, not crash-durable).")
+    record.set_defaults(func=cmd_record_verdict)
+
     return parser
 
 